@@ -6,6 +6,8 @@ command = '/usr/bin/gunicorn'
 worker_tmp_dir = os.getenv('GUNICORN_WORKER_TMP_DIR', None)
 bind = '0.0.0.0:%s' % int(os.getenv('PORT', default='8000'))
 workers = int(os.getenv('GUNICORN_WORKERS', default='3'))
+# Served over ASGI so the Twitter sign in flow waits on the network without tying up a worker
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', default='uvicorn_worker.UvicornWorker')
 loglevel = 'debug' if os.getenv('DEBUG', default='True').lower() in ['true', '1'] else 'info'
 
 # Send logging to the console
@@ -72,7 +72,12 @@ INSTALLED_APPS = [
 
 USE_WHITENOISE = get_bool_env('USE_WHITENOISE', False)
 
+# Per-request wall, DB and template timings, see fantasy_racing.picks.metrics. The middleware is only
+# installed when enabled, so it costs nothing otherwise.
+REQUEST_METRICS = get_bool_env('REQUEST_METRICS', False)
+
 MIDDLEWARE = list(filter(lambda x: x is not None, [
+    'fantasy_racing.picks.metrics.RequestMetricsMiddleware' if REQUEST_METRICS else None,
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware' if USE_WHITENOISE else None,
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -113,6 +118,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # On disk rather than SQLite's shared in-memory database, whose table locks fail concurrent
+        # writers straight away instead of making them wait like any real deployment would
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
@@ -120,6 +128,41 @@ if os.getenv('DATABASE_URL', None) is not None:
     DATABASES = {'default': dj_database_url.parse(os.environ.get('DATABASE_URL'))}
 
 
+# Caching
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+
+# Only rendered pages are kept here. Their versions are in the database (see picks/cache.py), so a cache
+# local to each process still drops pages straight away when any process writes.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    }
+}
+
+# Seconds a rendered public page is served from the cache, 0 disables page caching. Writes purge the pages
+# they change once they commit, this only bounds how long time-dependent parts (e.g. the current race) can lag.
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', default='300'))
+
+# Seconds before the statistics page recomputes its snapshot, and how many old snapshots are kept
+STATS_SNAPSHOT_MAX_AGE = int(os.getenv('STATS_SNAPSHOT_MAX_AGE', default='600'))
+STATS_SNAPSHOT_HISTORY = int(os.getenv('STATS_SNAPSHOT_HISTORY', default='100'))
+
+# Rows per page of the players and standings listings
+LISTING_PAGE_SIZE = int(os.getenv('LISTING_PAGE_SIZE', default='100'))
+
+# CDN caching, see picks/edge.py. Browsers and the edge keep live pages (the current race, seasons in
+# progress) for CDN_LIVE_MAX_AGE seconds. The edge keeps finished races and seasons for CDN_FINAL_MAX_AGE,
+# relying on purges when they change.
+CDN_LIVE_MAX_AGE = int(os.getenv('CDN_LIVE_MAX_AGE', default='60'))
+CDN_FINAL_MAX_AGE = int(os.getenv('CDN_FINAL_MAX_AGE', default=str(365 * 24 * 60 * 60)))
+# How writes purge the CDN, fantasy_racing.picks.edge.FastlyPurgeBackend with the service ID and token below
+CDN_PURGE_BACKEND = os.getenv('CDN_PURGE_BACKEND', default='fantasy_racing.picks.edge.NullPurgeBackend')
+CDN_SERVICE_ID = os.getenv('CDN_SERVICE_ID', default='')
+CDN_API_TOKEN = os.getenv('CDN_API_TOKEN', default='')
+CDN_PURGE_TIMEOUT = int(os.getenv('CDN_PURGE_TIMEOUT', default='5'))
+
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -158,6 +201,43 @@ TWITTER_CLIENT_SECRET = os.getenv('TWITTER_CLIENT_SECRET')
 TWITTER_KEY = os.getenv('TWITTER_KEY')
 TWITTER_SECRET = os.getenv('TWITTER_SECRET')
 TWITTER_CALLBACK = os.getenv('TWITTER_CALLBACK', 'http://127.0.0.1:8000/pick')
+# App-only token for lookups made outside of a user's sign in, like the background profile refresh
+TWITTER_BEARER_TOKEN = os.getenv('TWITTER_BEARER_TOKEN')
+# Where the sign in flow talks to Twitter, e.g. a local fantasy_racing.utils.fake_twitter server
+TWITTER_API_URL = os.getenv('TWITTER_API_URL', 'https://api.twitter.com').rstrip('/')
+# Seconds a whole Twitter call and just its connection may take, and connections pooled per worker
+TWITTER_TIMEOUT = float(os.getenv('TWITTER_TIMEOUT', default='5'))
+TWITTER_CONNECT_TIMEOUT = float(os.getenv('TWITTER_CONNECT_TIMEOUT', default='2'))
+TWITTER_MAX_CONNECTIONS = int(os.getenv('TWITTER_MAX_CONNECTIONS', default='100'))
+# Seconds an idle pooled connection is kept open for the next request
+TWITTER_KEEPALIVE_TIMEOUT = float(os.getenv('TWITTER_KEEPALIVE_TIMEOUT', default='60'))
+# Seconds a stored profile is trusted. Known players never wait on get_me again, their stale profiles
+# are queued for the refresh_profiles worker instead.
+TWITTER_PROFILE_TTL = int(os.getenv('TWITTER_PROFILE_TTL', default=str(7 * 24 * 60 * 60)))
+# Where refresh_profiles looks profiles up, fantasy_racing.picks.profiles.StubProfileBackend works offline
+PROFILE_REFRESH_BACKEND = os.getenv(
+    'PROFILE_REFRESH_BACKEND', default='fantasy_racing.picks.profiles.TwitterProfileBackend'
+)
+
+
+# Seconds a worker keeps its in-process copy of the active driver roster. Saves in the same
+# process clear it immediately, this only bounds staleness for changes made by other processes.
+DRIVER_ROSTER_TTL = int(os.getenv('DRIVER_ROSTER_TTL', default='300'))
+
+# Seconds a worker keeps its in-process copy of the upcoming races. Saves in the same process clear it
+# immediately and it never outlives midnight UTC or a submission deadline, this only bounds staleness for
+# changes made by other processes.
+CURRENT_RACE_TTL = int(os.getenv('CURRENT_RACE_TTL', default='60'))
+
+# Where each process flushes its request metric histograms for the dump_metrics command, how often,
+# how many seconds each histogram window covers and how long windows are kept
+REQUEST_METRICS_DIR = os.getenv('REQUEST_METRICS_DIR', default='/tmp/fantasy-racing-metrics')
+REQUEST_METRICS_FLUSH_INTERVAL = int(os.getenv('REQUEST_METRICS_FLUSH_INTERVAL', default='30'))
+REQUEST_METRICS_WINDOW = int(os.getenv('REQUEST_METRICS_WINDOW', default='300'))
+REQUEST_METRICS_RETENTION = int(os.getenv('REQUEST_METRICS_RETENTION', default='3600'))
+
+# Mixed into every pick seed, see fantasy_racing.picks.engine. Changing it changes every future draw.
+PICK_SEED_SALT = os.getenv('PICK_SEED_SALT', default='')
 
 
 # Static files (CSS, JavaScript, Images)
@@ -184,7 +264,8 @@ LOGGING = {
     'disable_existing_loggers': False,
     'handlers': {
         'console': {
-            'class': 'logging.StreamHandler'
+            'class': 'logging.StreamHandler',
+            'formatter': 'simple' if DEBUG else 'verbose',
         },
     },
     'filters': {
@@ -194,34 +275,29 @@ LOGGING = {
     },
     'formatters': {
         'verbose': {
-            'format': (
-                '[{schema_name}:{domain_url}] {levelname} {asctime} {module} {process:d} {thread:d} {message}'
-            ),
+            'format': '{levelname} {asctime} {name} {process:d} {thread:d} {message}',
             'style': '{',
         },
         'simple': {
-            'format': '[{schema_name}] {levelname} {message}',
+            'format': '{levelname} {name} {message}',
             'style': '{',
         },
     },
     'loggers': {
         'django': {
-            'formatter': 'simple' if DEBUG else 'verbose',
             'handlers': ['console'],
             'level': 'INFO',
             'propagate': True,
         },
         'fantasy_racing': {
-            'formatter': 'simple' if DEBUG else 'verbose',
             'handlers': ['console'],
             'level': LOG_LEVEL,
             'propagate': True,
         },
         'celery': {
-            'formatter': 'simple' if DEBUG else 'verbose',
             'handlers': ['console'],
             'level': LOG_LEVEL,
             'propagate': True,
         },
     },
-}
\ No newline at end of file
+}
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import FAQ, Race, RaceDriver, RacePick, RaceResult, RaceTeam, Schedule, TwitterUser
+from .models import CareerStanding, FAQ, Race, RaceDriver, RacePick, RaceResult, RaceTeam, Schedule, SeasonStanding, StatsSnapshot, TwitterUser
 
 
 admin.site.site_header = 'F1 Random Fantasy'
@@ -19,6 +19,7 @@ class FAQAdmin(admin.ModelAdmin):
 class ScheduleAdmin(admin.ModelAdmin):
 
     list_display = ('year',)
+    search_fields = ('year',)
 
 
 @admin.register(RaceTeam)
@@ -31,26 +32,53 @@ class RaceTeamAdmin(admin.ModelAdmin):
 @admin.register(RaceDriver)
 class RaceDriverAdmin(admin.ModelAdmin):
 
-    list_display = ('name', 'default_team')
+    list_display = ('name', 'default_team', 'is_active')
+    list_filter = ('is_active',)
+    list_select_related = ('default_team',)
     search_fields = ('first_name', 'last_name', 'default_team__name')
 
 
 @admin.register(Race)
 class RaceAdmin(admin.ModelAdmin):
 
-    list_display = ('track', 'date', 'is_viewable', 'is_current')
+    list_display = ('track', 'date', 'schedule', 'viewable', 'current')
+    list_filter = ('schedule',)
+    list_select_related = ('schedule',)
+    search_fields = ('track',)
+    date_hierarchy = 'date'
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_state()
+
+    @admin.display(boolean=True, ordering='_is_viewable')
+    def viewable(self, obj):
+        return obj.is_viewable
+
+    @admin.display(boolean=True, ordering='_is_current')
+    def current(self, obj):
+        return obj.is_current
 
 
 @admin.register(RacePick)
 class RacePickAdmin(admin.ModelAdmin):
 
-    list_display = ('user', 'race', 'driver')
+    list_display = ('user', 'race', 'driver', 'timestamp')
+    list_filter = ('race__schedule', 'race', 'driver')
+    list_select_related = ('user', 'race', 'driver')
+    autocomplete_fields = ('user', 'race', 'driver')
+    raw_id_fields = ('result',)
+    # Newest first along the primary key, there are far too many picks to sort them by timestamp
+    ordering = ('-id',)
+    show_full_result_count = False
 
 
 @admin.register(RaceResult)
 class RaceResultAdmin(admin.ModelAdmin):
 
-    list_display = ('race', 'driver', 'position')
+    list_display = ('race', 'driver', 'position', 'points')
+    list_filter = ('race__schedule', 'race', 'driver')
+    list_select_related = ('race', 'driver')
+    autocomplete_fields = ('race', 'driver')
 
 
 @admin.register(TwitterUser)
@@ -62,3 +90,26 @@ class TwitterUserAdmin(admin.ModelAdmin):
     @admin.display(ordering='username', description='Display Name')
     def display_name(self, obj):
         return str(obj)
+
+
+@admin.register(SeasonStanding)
+class SeasonStandingAdmin(admin.ModelAdmin):
+
+    list_display = ('user', 'schedule', 'points', 'starts', 'wins')
+    list_filter = ('schedule',)
+    list_select_related = ('user', 'schedule')
+    autocomplete_fields = ('user', 'schedule')
+
+
+@admin.register(CareerStanding)
+class CareerStandingAdmin(admin.ModelAdmin):
+
+    list_display = ('user', 'points', 'starts', 'wins', 'avg_finish')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
+
+
+@admin.register(StatsSnapshot)
+class StatsSnapshotAdmin(admin.ModelAdmin):
+
+    list_display = ('created',)
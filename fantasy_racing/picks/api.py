@@ -0,0 +1,145 @@
+"""Read-only JSON API, versioned by URL prefix (`/api/v1/...`)
+
+Rows are read with `values_list()` so no models are built, and long lists are encoded and sent in chunks
+rather than as one document. The rows are fetched before the response streams, since the chunks are
+produced on the event loop under ASGI where the ORM can't be used.
+
+Every endpoint answers conditional requests from the versions of the surrogate keys its data depends on
+(see `PageVersion`), which purges move on from whichever process made the write, so a write only changes
+the validators of the endpoints it affects. The ETag is those versions plus today's date, which the current
+race depends on. Last-Modified is when the latest of them moved.
+"""
+import datetime
+from typing import Callable, Iterable, Iterator, Sequence
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, HttpRequest, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views.decorators.http import condition, require_safe
+
+from . import edge
+from .models import (
+    STANDING_FIELDS, CareerStanding, PageVersion, Race, RacePick, Schedule, SeasonStanding, TwitterUser,
+)
+
+
+VERSION = 1
+
+# Rows encoded per chunk of a streamed list
+CHUNK_SIZE = 500
+
+encoder = DjangoJSONEncoder()
+
+
+def api_view(data_keys: Callable[..., Iterable[str]]):
+    """Serve a read-only endpoint, answering conditional requests from the versions of the surrogate keys
+    `data_keys` names for the view's URL arguments
+    """
+    def data_versions(request: HttpRequest, **kwargs) -> list:
+        # Read once for both validators, keys that have never been purged are on 0
+        if not hasattr(request, 'data_versions'):
+            keys = sorted({edge.ALL_PAGES, *data_keys(**kwargs)})
+            rows = {key: (version, changed) for key, version, changed in
+                    PageVersion.objects.filter(key__in=keys).values_list('key', 'version', 'changed')}
+            request.data_versions = [(key, *rows.get(key, (0, None))) for key in keys]
+        return request.data_versions
+
+    def data_etag(request: HttpRequest, **kwargs) -> str:
+        versions = '.'.join(str(version) for _, version, _ in data_versions(request, **kwargs))
+        return f'v{VERSION}-{versions}-{timezone.now().date().isoformat()}'
+
+    def data_last_modified(request: HttpRequest, **kwargs) -> datetime.datetime:
+        now = timezone.now()
+        midnight = datetime.datetime.combine(now.date(), datetime.time(), datetime.timezone.utc)
+        return max([midnight] + [changed for _, _, changed in data_versions(request, **kwargs) if changed])
+
+    def decorator(view):
+        return require_safe(condition(etag_func=data_etag, last_modified_func=data_last_modified)(view))
+    return decorator
+
+
+def stream_json(head: dict, key: str, fields: Sequence[str], rows: Iterable[tuple]) -> StreamingHttpResponse:
+    """Stream `{**head, key: [...]}` with each of `rows` as an object of `fields`
+    """
+    def chunks() -> Iterator[str]:
+        yield encoder.encode(head)[:-1] + (', ' if head else '') + f'{encoder.encode(key)}: ['
+        for start in range(0, len(rows), CHUNK_SIZE):
+            chunk = ', '.join(encoder.encode(dict(zip(fields, row))) for row in rows[start:start + CHUNK_SIZE])
+            yield f', {chunk}' if start else chunk
+        yield ']}'
+
+    rows = list(rows)
+    return StreamingHttpResponse(chunks(), content_type='application/json')
+
+
+RACE_FIELDS = ('id', 'track', 'date', 'submit_by')
+
+
+@api_view(lambda year: [edge.schedule_key(year)])
+def schedule(request, year: int):
+    schedule = get_object_or_404(Schedule, year=year)
+    races = Race.objects.filter(schedule=schedule).order_by('date').values_list(*RACE_FIELDS)
+    response = JsonResponse({'year': schedule.year, 'races': [dict(zip(RACE_FIELDS, race)) for race in races]},
+                            encoder=DjangoJSONEncoder)
+    return edge.cache_at_edge(response, [edge.schedule_key(schedule.year)], final=schedule.is_finished)
+
+
+PICK_FIELDS = ('username', 'driver_number', 'driver', 'position', 'points', 'timestamp')
+
+
+def race_keys(id: int) -> list:
+    # Usernames in the picks change with their players' seasons
+    years = Race.objects.filter(id=id).values_list('schedule__year', flat=True)
+    return [edge.race_key(id)] + [edge.schedule_key(year) for year in years]
+
+
+@api_view(race_keys)
+def race_picks(request, id: int):
+    race = Race.objects.filter(id=id).values('id', 'track', 'date', 'schedule__year').first()
+    if race is None:
+        raise Http404
+    picks = RacePick.objects.filter(race=id).order_by('timestamp', 'id').values_list(
+        'user__username', 'driver__default_number', 'driver__last_name', 'result__position', 'result__points',
+        'timestamp',
+    )
+    race['year'] = race.pop('schedule__year')
+    response = stream_json({'race': race}, 'picks', PICK_FIELDS, picks)
+    keys = [edge.race_key(race['id']), edge.schedule_key(race['year'])]
+    return edge.cache_at_edge(response, keys, final=race['date'] < timezone.now().date())
+
+
+STANDING_LIST_FIELDS = ('position', 'username') + STANDING_FIELDS
+
+
+@api_view(lambda year: [edge.schedule_key(year)])
+def standings(request, year: int):
+    schedule = get_object_or_404(Schedule, year=year)
+    rows = SeasonStanding.objects.filter(schedule=schedule, starts__gt=0).order_by('-points', 'user_id') \
+                                 .values_list('user__username', *STANDING_FIELDS)
+    response = stream_json(
+        {'year': schedule.year}, 'standings', STANDING_LIST_FIELDS,
+        ((position,) + row for position, row in enumerate(rows, start=1)),
+    )
+    return edge.cache_at_edge(response, [edge.schedule_key(schedule.year)], final=schedule.is_finished)
+
+
+@api_view(lambda: [edge.LISTINGS])
+def players(request):
+    rows = CareerStanding.objects.filter(starts__gt=0).order_by('-starts', 'avg_finish', 'user_id') \
+                                 .values_list('user__username', *STANDING_FIELDS)
+    return edge.cache_at_edge(stream_json({}, 'players', ('username',) + STANDING_FIELDS, rows), [edge.LISTINGS])
+
+
+# Every write to a player's profile or totals purges the listings, while results leave the player's own key
+@api_view(lambda username: [edge.LISTINGS])
+def player(request, username: str):
+    user = get_object_or_404(TwitterUser.objects.values('id', 'username', 'name', 'profile_img'), username=username)
+    career = CareerStanding.objects.filter(user=user['id']).values(*STANDING_FIELDS).first()
+    seasons = SeasonStanding.objects.filter(user=user['id']).order_by('-schedule__year') \
+                                    .values('schedule__year', *STANDING_FIELDS)
+    return edge.cache_at_edge(JsonResponse({
+        'username': user['username'], 'name': user['name'], 'profile_img': user['profile_img'],
+        'career': career or dict.fromkeys(STANDING_FIELDS, 0),
+        'seasons': [{'year': season.pop('schedule__year'), **season} for season in seasons],
+    }), [edge.user_key(user['id'])])
@@ -0,0 +1,74 @@
+"""Whole-page caching for the public, read-only views
+
+Rendered pages are stored in the default cache along with the surrogate keys they carry (see `edge.py`)
+and the version each key had when the page was rendered. Purging a key bumps its `PageVersion` row once the
+write commits, so only the pages showing what changed are rendered again: a new pick drops its race, player
+and season pages, not every finished season. The versions live in the database, so serving a cached page
+costs one query for them, and a purge in any process reaches pages cached by every other one even when
+the default cache is local to each process.
+"""
+from functools import wraps
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+from .models import PageVersion
+
+
+def per_season(version_field: str):
+    """Keep what the decorated `build(schedule)` derives from a season in-process until the schedule's
+    `version_field` moves. The version is read from the schedule passed in, so it has to be freshly loaded
+    for changes made by other processes to show.
+    """
+    def decorator(build):
+        built = {}
+
+        @wraps(build)
+        def wrapper(schedule):
+            version = getattr(schedule, version_field)
+            cached = built.get(schedule.id)
+            if cached is None or cached[0] != version:
+                cached = built[schedule.id] = (version, build(schedule))
+            return cached[1]
+        return wrapper
+    return decorator
+
+
+def page_key(request: HttpRequest, view_name: str) -> str:
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'page:{view_name}:{path}'
+
+
+def cached_page(view):
+    """Serve successful GET responses of a view from the cache until one of their surrogate keys is purged
+    """
+    @wraps(view)
+    def wrapper(request: HttpRequest, *args, **kwargs):
+        if request.method != 'GET' or not settings.PAGE_CACHE_TIMEOUT:
+            return view(request, *args, **kwargs)
+
+        page = page_key(request, view.__name__)
+        cached = cache.get(page)
+        versions = {}
+        if cached is not None:
+            content, status, headers, rendered_versions = cached
+            versions = PageVersion.objects.versions(rendered_versions)
+            if versions == rendered_versions:
+                response = HttpResponse(content, status=status)
+                for header, value in headers:
+                    response[header] = value
+                return response
+
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.streaming:
+            # Versions read before rendering where there are any, so a write landing mid-render isn't
+            # stored as the latest
+            keys = response.get('Surrogate-Key', '').split()
+            current = {key: versions[key] for key in keys if key in versions}
+            current.update(PageVersion.objects.versions(key for key in keys if key not in current))
+            cache.set(page, (response.content, response.status_code, list(response.items()), current),
+                      settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
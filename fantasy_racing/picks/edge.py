@@ -0,0 +1,123 @@
+"""HTTP caching at the CDN in front of the site
+
+Public responses say how long they may be kept (`Cache-Control`) and carry a `Surrogate-Key` header naming
+what they show: `race-<id>`, `schedule-<year>`, `user-<id>`, `listings` on the pages covering every player,
+plus `pages` on every one of them. Pages that can still change on their own, like the current race or a
+season in progress, are kept briefly. Pages of finished races and seasons are kept at the edge for
+`CDN_FINAL_MAX_AGE`, i.e. until a write purges them.
+
+Writes purge the keys they affect once they commit (see the receivers in `models.py`), from the local page
+cache and through the backend named by `CDN_PURGE_BACKEND`, and send `purged`. Browsers can't be purged, so
+they never keep a page longer than `CDN_LIVE_MAX_AGE`.
+"""
+import logging
+from typing import Iterable, Sequence
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+import requests
+
+
+
+logger = logging.getLogger(__name__)
+
+# On every cached response, purging it purges the whole site
+ALL_PAGES = 'pages'
+
+# On the pages summarising every player, which any pick or result can change
+LISTINGS = 'listings'
+
+# Sent with the purged `keys` after every purge
+purged = Signal()
+
+
+def race_key(race_id: int) -> str:
+    return f'race-{race_id}'
+
+
+def schedule_key(year: int) -> str:
+    return f'schedule-{year}'
+
+
+def user_key(user_id: int) -> str:
+    return f'user-{user_id}'
+
+
+def cache_at_edge(response: HttpResponse, keys: Iterable[str] = (), final: bool = False) -> HttpResponse:
+    """Mark a response cacheable by the CDN under `keys`, for good if it shows something `final`
+    """
+    edge_max_age = settings.CDN_FINAL_MAX_AGE if final else settings.CDN_LIVE_MAX_AGE
+    patch_cache_control(response, public=True, max_age=settings.CDN_LIVE_MAX_AGE, s_maxage=edge_max_age)
+    response['Surrogate-Key'] = ' '.join(dict.fromkeys([ALL_PAGES, *keys]))
+    return response
+
+
+class PurgeBackend:
+    """Drops every cached response tagged with any of the given surrogate keys
+    """
+
+    def purge(self, keys: Sequence[str]):
+        raise NotImplementedError
+
+
+class NullPurgeBackend(PurgeBackend):
+    """No CDN in front of the site
+    """
+
+    def purge(self, keys: Sequence[str]):
+        pass
+
+
+class LocalPurgeBackend(PurgeBackend):
+    """Remembers purged keys in memory instead, for tests and local development
+    """
+
+    purged = []
+
+    def purge(self, keys: Sequence[str]):
+        LocalPurgeBackend.purged.extend(keys)
+
+
+class FastlyPurgeBackend(PurgeBackend):
+    """Fastly's purge by surrogate key, see https://developer.fastly.com/reference/api/purging/
+    """
+
+    # The most keys Fastly accepts in one purge request
+    batch_size = 256
+
+    def purge(self, keys: Sequence[str]):
+        url = f'https://api.fastly.com/service/{settings.CDN_SERVICE_ID}/purge'
+        for start in range(0, len(keys), self.batch_size):
+            batch = keys[start:start + self.batch_size]
+            try:
+                response = requests.post(url, timeout=settings.CDN_PURGE_TIMEOUT, headers={
+                    'Fastly-Key': settings.CDN_API_TOKEN, 'Surrogate-Key': ' '.join(batch),
+                })
+                response.raise_for_status()
+            except requests.RequestException:
+                # The write has already happened, all that's left is to say which pages are stale
+                logger.exception('Failed to purge %s', ' '.join(batch))
+
+
+def get_backend() -> PurgeBackend:
+    return import_string(settings.CDN_PURGE_BACKEND)()
+
+
+def purge(*keys: str, cdn: bool = True):
+    """Purge keys once the current transaction commits, so no cache refetches data about to change.
+    Without `cdn` only the page cache is purged, for pages the CDN keeps briefly anyway.
+    """
+    keys = sorted(set(keys))
+    if keys:
+        transaction.on_commit(lambda: purge_now(keys, cdn=cdn))
+
+
+def purge_now(keys: Sequence[str], cdn: bool = True):
+    # The page cache is purged by a receiver in `models.py`, which bumps the keys' versions
+    purged.send(sender=None, keys=keys)
+    if cdn:
+        get_backend().purge(keys)
@@ -0,0 +1,66 @@
+"""Deterministic pick draws
+
+Every pick is derived from a seed that only depends on the race, the user and `PICK_SEED_SALT`, and the
+seed is stored on the `RacePick`. The roster a race is drawn from is stored on the `Race` by its first
+pick (see `RaceDriverManager.race_roster`), so any pick can be redrawn and verified offline however the
+active drivers change later. Whole races or seasons can be drawn at once since a draw is just arithmetic.
+"""
+import hashlib
+from typing import Iterable, List, Optional, Sequence
+
+from django.conf import settings
+
+from .models import Race, RaceDriver, RacePick
+
+
+# Seeds are stored in a signed 64-bit column
+SEED_MASK = (1 << 63) - 1
+
+
+def pick_seed(race_id: int, user_id: int) -> int:
+    digest = hashlib.blake2b(f'{settings.PICK_SEED_SALT}:{race_id}:{user_id}'.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') & SEED_MASK
+
+
+def draw(seed: int, roster: Sequence[RaceDriver] = None) -> RaceDriver:
+    """Map a seed onto a driver from the roster, the cached active roster by default
+    """
+    roster = roster if roster is not None else RaceDriver.objects.active_roster()
+    # The seed is a uniform 63-bit hash, so the modulo bias over ~20 drivers is negligible
+    return roster[seed % len(roster)]
+
+
+def draw_many(race_id: int, user_ids: Iterable[int], roster: Sequence[RaceDriver] = None) -> List[tuple]:
+    """Draw a pick for every user in a race in one call, returning `(user_id, seed, driver)` tuples
+    """
+    roster = roster if roster is not None else RaceDriver.objects.active_roster()
+    size = len(roster)
+    seeds = [(user_id, pick_seed(race_id, user_id)) for user_id in user_ids]
+    return [(user_id, seed, roster[seed % size]) for user_id, seed in seeds]
+
+
+def simulate_season(race_ids: Iterable[int], user_ids: Sequence[int], roster: Sequence[RaceDriver] = None) -> dict:
+    """Draw every pick for a season, keyed by race ID
+    """
+    return {race_id: draw_many(race_id, user_ids, roster=roster) for race_id in race_ids}
+
+
+def stored_roster(race: Race) -> Optional[List[RaceDriver]]:
+    """The roster stored with a race, None for races drawn before rosters were stored
+    """
+    if race.roster is None:
+        return None
+    return RaceDriver.objects.in_roster_order(race.roster)
+
+
+def verify_race(race: Race, roster: Sequence[RaceDriver] = None) -> List[RacePick]:
+    """Redraw the seeded picks of a race and return the ones that don't match what was stored
+    """
+    # Races without a stored roster can only be checked against today's active one
+    roster = roster if roster is not None else stored_roster(race)
+    picks = list(race.picks.filter(seed__isnull=False).only('id', 'user_id', 'driver_id', 'seed'))
+    drawn = draw_many(race.id, [pick.user_id for pick in picks], roster=roster)
+    return [
+        pick for pick, (_, seed, driver) in zip(picks, drawn)
+        if pick.seed != seed or pick.driver_id != driver.id
+    ]
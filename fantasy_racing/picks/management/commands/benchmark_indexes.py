@@ -0,0 +1,103 @@
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from fantasy_racing.picks import synthetic
+from fantasy_racing.picks.models import Race, RacePick, RaceResult, SeasonStanding, TwitterUser
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a synthetic dataset and report EXPLAIN plans and latencies of the hot pick/result queries with '
+        'and without the hot path indexes. Everything runs in a transaction that is rolled back afterwards, '
+        'but the dropped indexes lock their tables until then, so only run it against a scratch database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--seasons', type=int, default=2)
+        parser.add_argument('--races', type=int, default=22)
+        parser.add_argument('--repeat', type=int, default=20, help='Timed runs per query')
+        parser.add_argument(
+            '--i-know-this-is-not-production', action='store_true', dest='not_production',
+            help='Run against a database that already has players in it'
+        )
+
+    def handle(self, *args, users, seasons, races, repeat, not_production=False, **options):
+        # DROP INDEX holds an exclusive lock on each table until the rollback, blocking every read and write
+        if not not_production and TwitterUser.objects.exists():
+            raise CommandError(
+                f'{connection.settings_dict["NAME"]} already has players, benchmark indexes on a scratch '
+                'database or pass --i-know-this-is-not-production'
+            )
+        self.stdout.write(f'Benchmarking on {connection.vendor}')
+        try:
+            with transaction.atomic():
+                started = time.perf_counter()
+                counts = synthetic.generate(users=users, seasons=seasons, races=races)
+                self.stdout.write(f'Seeded {counts} in {time.perf_counter() - started:.1f}s')
+                if connection.vendor == 'postgresql':
+                    with connection.cursor() as cursor:
+                        cursor.execute('ANALYZE')
+
+                queries = self.hot_queries()
+                with_indexes = self.measure(queries, repeat, label='with indexes')
+                self.drop_indexes()
+                without_indexes = self.measure(queries, repeat, label='without indexes')
+                raise Rollback
+        except Rollback:
+            pass
+
+        for name in queries:
+            (plan_after, ms_after), (plan_before, ms_before) = with_indexes[name], without_indexes[name]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{name}: {ms_before:.2f}ms -> {ms_after:.2f}ms'))
+            self.stdout.write(f'  without indexes:\n    {plan_before}')
+            self.stdout.write(f'  with indexes:\n    {plan_after}')
+
+    @staticmethod
+    def hot_queries() -> dict:
+        race = Race.objects.filter(results__isnull=False).last()
+        pick = race.picks.first()
+        return {
+            'link result to picks': RacePick.objects.filter(race=race, driver=pick.driver_id),
+            'player season picks': RacePick.objects.filter(user=pick.user_id, race__schedule=race.schedule_id),
+            'winning picks': RacePick.objects.filter(result__position=1).values('id'),
+            'top 10 picks': RacePick.objects.filter(result__position__lte=10).values('id'),
+            'current race': Race.objects.filter(date__gte=timezone.now().date())[:1],
+            'season standings': SeasonStanding.objects.filter(schedule=race.schedule_id)[:50],
+        }
+
+    @staticmethod
+    def explain(queryset, label: str) -> str:
+        # sqlite3 keeps prepared EXPLAIN statements around even after the schema changes, so the label
+        # comment makes each phase's statement distinct
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'{connection.ops.explain_query_prefix()} /* {label} */ {sql}', params)
+            return '\n    '.join(' '.join(str(col) for col in row) for row in cursor.fetchall())
+
+    def measure(self, queries: dict, repeat: int, label: str) -> dict:
+        measured = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - started) * 1000)
+            measured[name] = (self.explain(queryset, label), statistics.median(timings))
+        return measured
+
+    @staticmethod
+    def drop_indexes():
+        # Plain DDL rather than the schema editor, which SQLite refuses to use inside a transaction
+        with connection.cursor() as cursor:
+            for model in (Race, RacePick, RaceResult):
+                for index in model._meta.indexes:
+                    cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
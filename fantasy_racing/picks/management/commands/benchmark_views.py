@@ -0,0 +1,117 @@
+import json
+import math
+import statistics
+import time
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from fantasy_racing.picks import urls
+from fantasy_racing.picks.models import Race, RacePick, Schedule
+
+
+# These views need a Twitter OAuth round trip
+SKIPPED_VIEWS = ('play', 'pick')
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Drive every URL in picks/urls.py through the test client against the configured database and '
+        'report p50/p95 latency, query count and peak memory per view as JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20, help='Timed requests per view')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--label', default='', help='Free-form label stored in the report, e.g. a commit')
+        parser.add_argument(
+            '--page-cache', action='store_true',
+            help='Leave the page cache on, otherwise every request renders the view'
+        )
+
+    def handle(self, *args, repeat, output=None, label='', page_cache=False, **options):
+        client = Client()
+        report = {
+            'label': label,
+            'vendor': connection.vendor,
+            'timestamp': timezone.now().isoformat(),
+            'repeat': repeat,
+            'page_cache': page_cache,
+            'views': {},
+        }
+        cache_settings = {} if page_cache else {'PAGE_CACHE_TIMEOUT': 0}
+        with override_settings(**cache_settings):
+            for name, path in self.view_paths().items():
+                report['views'][name] = self.benchmark(client, path, repeat) if path else {'skipped': True}
+
+        report_json = json.dumps(report, indent=2)
+        if output:
+            with open(output, 'w') as f:
+                f.write(report_json)
+            self.stderr.write(f'Wrote {output}')
+        else:
+            self.stdout.write(report_json)
+
+    @staticmethod
+    def view_paths() -> dict:
+        """A representative path for every named URL, using the busiest race, season and player
+        """
+        race = Race.objects.filter(picks__isnull=False).select_related('schedule').order_by('-date').first()
+        schedule = race.schedule if race else Schedule.objects.last()
+        pick = RacePick.objects.filter(race=race).select_related('user').first()
+        kwargs = {
+            'year': schedule.year if schedule else None,
+            'id': race.id if race else None,
+            'username': pick.user.username if pick else None,
+        }
+
+        paths = {}
+        for pattern in urls.urlpatterns:
+            params = pattern.pattern.converters.keys()
+            if pattern.name in SKIPPED_VIEWS or any(kwargs[param] is None for param in params):
+                paths[pattern.name] = None
+                continue
+            paths[pattern.name] = reverse(pattern.name, kwargs={param: kwargs[param] for param in params})
+        return paths
+
+    @staticmethod
+    def benchmark(client: Client, path: str, repeat: int) -> dict:
+        # Warm up once (template loading, roster and current race caches), then count queries
+        client.get(path)
+        # With DEBUG on the query log may already be full, and a full log can't grow to be counted
+        reset_queries()
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+        # Counted right away, the next request resets the query log the capture slices into
+        num_queries = len(queries)
+
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            client.get(path)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        # Memory is traced separately since tracemalloc slows everything down
+        tracemalloc.start()
+        client.get(path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': num_queries,
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'peak_memory_kb': round(peak / 1024, 1),
+        }
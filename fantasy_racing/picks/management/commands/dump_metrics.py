@@ -0,0 +1,49 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from fantasy_racing.picks import metrics
+
+
+class Command(BaseCommand):
+    help = 'Merge the request metric histograms flushed by every worker and print a summary per URL name'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=int, default=None, help='Only include the last N seconds')
+        parser.add_argument('--json', action='store_true', dest='as_json', help='Print machine-readable JSON')
+        parser.add_argument(
+            '--sort', choices=metrics.METRICS, default='total_ms',
+            help='Metric whose p95 orders the table'
+        )
+
+    def handle(self, *args, since=None, as_json=False, sort='total_ms', **options):
+        # This process's own histograms are not on disk yet, e.g. when called from a shell
+        if metrics.registry.windows:
+            with metrics.registry.lock:
+                metrics.registry.flush()
+        oldest = time.time() - since if since else 0
+        merged = metrics.load(settings.REQUEST_METRICS_DIR, since=oldest)
+        summary = {
+            view: {metric: histogram.summary() for metric, histogram in histograms.items()}
+            for view, histograms in merged.items()
+        }
+
+        if as_json:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+
+        if not summary:
+            self.stdout.write(f'No metrics in {settings.REQUEST_METRICS_DIR}')
+            return
+        self.stdout.write(
+            f'{"view":<20} {"count":>7} {"total p50":>10} {"total p95":>10} {"db p95":>8} '
+            f'{"tpl p95":>8} {"queries p95":>12}'
+        )
+        for view, stats in sorted(summary.items(), key=lambda item: -item[1][sort]['p95']):
+            self.stdout.write(
+                f'{view:<20} {stats["total_ms"]["count"]:>7} {stats["total_ms"]["p50"]:>10.1f} '
+                f'{stats["total_ms"]["p95"]:>10.1f} {stats["db_ms"]["p95"]:>8.1f} '
+                f'{stats["template_ms"]["p95"]:>8.1f} {stats["queries"]["p95"]:>12.0f}'
+            )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fantasy_racing.picks import synthetic
+from fantasy_racing.picks import edge
+from fantasy_racing.picks.models import StatsSnapshot
+
+
+class Command(BaseCommand):
+    help = 'Generate synthetic players, seasons, races, picks and results for benchmarks and load tests'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--seasons', type=int, default=1)
+        parser.add_argument('--races', type=int, default=22, help='Races per season')
+        parser.add_argument('--drivers', type=int, default=20, help='Minimum number of active drivers')
+        parser.add_argument(
+            '--participation', type=float, default=1.0,
+            help='Chance that a player picks in any given race'
+        )
+        parser.add_argument('--no-results', action='store_true', help='Leave every race without results')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for finishing orders and participation')
+
+    def handle(self, *args, users, seasons, races, drivers, participation, no_results, seed, **options):
+        started = time.perf_counter()
+        with transaction.atomic():
+            counts = synthetic.generate(
+                users=users, seasons=seasons, races=races, drivers=drivers,
+                participation=participation, with_results=not no_results, seed=seed,
+            )
+            StatsSnapshot.objects.refresh()
+        edge.purge(edge.ALL_PAGES)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {counts["users"]} users, {counts["races"]} races, {counts["picks"]} picks and '
+            f'{counts["results"]} results in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,133 @@
+import csv
+import datetime
+import json
+from collections import defaultdict
+from pathlib import Path
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+import yaml
+
+from fantasy_racing.picks import edge
+from fantasy_racing.picks.models import Race, RaceDriver, RacePick, RaceResult, SeasonStanding, StatsSnapshot
+
+
+FORMATS = ('csv', 'json', 'yaml')
+
+
+class Command(BaseCommand):
+    help = (
+        'Bulk load race results from a CSV, JSON or YAML file. Each record needs a `driver` (car number or '
+        '"First Last"), a `position` and `points`, plus a `race` date unless --race is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help='File containing the results')
+        parser.add_argument('--format', choices=FORMATS, help='Defaults to the file extension')
+        parser.add_argument('--race', type=datetime.date.fromisoformat, help='Date of the race the records are for')
+        parser.add_argument('--year', type=int, help='Only ingest records for races in this season')
+        parser.add_argument(
+            '--replace', action='store_true',
+            help='Replace races that already have results instead of failing'
+        )
+
+    def handle(self, *args, path: Path, format=None, race=None, year=None, replace=False, **options):
+        started = time.perf_counter()
+        records = self.read(path, format or path.suffix.lstrip('.').replace('yml', 'yaml'))
+        results_by_race = self.build_results(records, default_race=race, year=year)
+        self.stdout.write(f'Parsed {len(records)} results for {len(results_by_race)} races in {self.since(started)}')
+
+        with transaction.atomic():
+            existing = set(
+                RaceResult.objects.filter(race__in=results_by_race).values_list('race_id', flat=True).distinct()
+            )
+            if existing and not replace:
+                raise CommandError(f'Results already exist for race IDs {sorted(existing)}, use --replace')
+            if existing:
+                # Results cascade to the picks pointing at them, so detach the picks before clearing
+                RacePick.objects.filter(race__in=existing).update(result=None)
+                RaceResult.objects.filter(race__in=existing).delete()
+
+            for race, results in results_by_race.items():
+                race_started = time.perf_counter()
+                RaceResult.objects.bulk_create(results)
+                linked = RacePick.objects.filter(race=race).update(result=models.Subquery(
+                    RaceResult.objects.filter(race=race, driver=models.OuterRef('driver')).values('id')[:1]
+                ))
+                self.stdout.write(f'{race}: {len(results)} results, {linked} picks linked in {self.since(race_started)}')
+
+            # bulk_create skips the post_save signals, so the standings are rebuilt once per season instead
+            for schedule in {race.schedule for race in results_by_race}:
+                SeasonStanding.objects.rebuild(schedule)
+            StatsSnapshot.objects.refresh()
+            edge.purge(*(edge.race_key(race.id) for race in results_by_race),
+                       *(edge.schedule_key(race.date.year) for race in results_by_race), edge.LISTINGS)
+
+        total = sum(len(results) for results in results_by_race.values())
+        self.stdout.write(self.style.SUCCESS(f'Ingested {total} results in {self.since(started)}'))
+
+    @staticmethod
+    def since(started: float) -> str:
+        return f'{(time.perf_counter() - started) * 1000:.1f}ms'
+
+    @staticmethod
+    def read(path: Path, format: str) -> list:
+        if format not in FORMATS:
+            raise CommandError(f'Unknown format "{format}", use --format')
+        with path.open() as f:
+            try:
+                if format == 'csv':
+                    records = list(csv.DictReader(f))
+                elif format == 'json':
+                    records = json.load(f)
+                else:
+                    records = yaml.safe_load(f)
+            except (csv.Error, ValueError, yaml.YAMLError) as e:
+                raise CommandError(f'Unable to parse {path}: {e}')
+        if not records or not isinstance(records, list):
+            raise CommandError(f'{path} does not contain a list of records')
+        return records
+
+    def build_results(self, records: list, default_race: datetime.date = None, year: int = None) -> dict:
+        races = {race.date: race for race in Race.objects.select_related('schedule')}
+        drivers = {}
+        # Active drivers win when a car number has been used by more than one driver
+        for driver in RaceDriver.objects.order_by('is_active'):
+            drivers[str(driver.default_number)] = driver
+            drivers[driver.name.lower()] = driver
+
+        results_by_race = defaultdict(list)
+        seen = set()
+        for idx, record in enumerate(records, start=1):
+            if not isinstance(record, dict):
+                raise CommandError(f'Record {idx}: expected a mapping, got {record!r}')
+            race_date = record.get('race') or default_race
+            if isinstance(race_date, str):
+                try:
+                    race_date = datetime.date.fromisoformat(race_date)
+                except ValueError:
+                    raise CommandError(f'Record {idx}: invalid race date in {record}')
+            race = races.get(race_date)
+            if race is None:
+                raise CommandError(f'Record {idx}: no race on {race_date}')
+            if (default_race and race.date != default_race) or (year and race.schedule.year != year):
+                continue
+
+            driver = drivers.get(str(record.get('driver', '')).strip().lower())
+            if driver is None:
+                raise CommandError(f'Record {idx}: unknown driver in {record}')
+            try:
+                position, points = int(record['position']), int(record['points'])
+            except (KeyError, TypeError, ValueError):
+                raise CommandError(f'Record {idx}: position and points must be whole numbers in {record}')
+            if position < 1:
+                raise CommandError(f'Record {idx}: position must be at least 1 in {record}')
+
+            # Caught here rather than by the unique constraints, to say which record is to blame
+            for key in ((race, 'driver', driver.id), (race, 'position', position)):
+                if key in seen:
+                    raise CommandError(f'Record {idx}: {race} already has a result for that {key[1]} in {record}')
+                seen.add(key)
+            results_by_race[race].append(RaceResult(race=race, driver=driver, position=position, points=points))
+        return results_by_race
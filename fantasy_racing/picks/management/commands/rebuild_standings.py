@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from fantasy_racing.picks import edge
+from fantasy_racing.picks.models import Schedule, SeasonStanding, TwitterUser
+
+
+COMPARED_FIELDS = ('points', 'starts', 'wins', 'podiums', 'top_10s')
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the materialized season standings and verify them against the live aggregate'
+
+    def add_arguments(self, parser):
+        parser.add_argument('years', nargs='*', type=int, help='Seasons to rebuild, defaults to every season')
+        parser.add_argument(
+            '--check-only', action='store_true',
+            help='Only compare the stored standings with the live aggregate, do not rebuild'
+        )
+
+    def handle(self, *args, years=None, check_only=False, **options):
+        schedules = Schedule.objects.all()
+        if years:
+            schedules = schedules.filter(year__in=years)
+
+        mismatches = 0
+        for schedule in schedules:
+            if not check_only:
+                rows = SeasonStanding.objects.rebuild(schedule)
+                edge.purge(edge.schedule_key(schedule.year), edge.LISTINGS)
+                self.stdout.write(f'Rebuilt {len(rows)} standings for {schedule}')
+            mismatches += self.check_schedule(schedule)
+
+        if mismatches:
+            raise CommandError(f'{mismatches} standings do not match the live aggregate')
+        self.stdout.write(self.style.SUCCESS('Standings match the live aggregate'))
+
+    def check_schedule(self, schedule: Schedule) -> int:
+        stored = {standing.user_id: standing for standing in SeasonStanding.objects.filter(schedule=schedule)}
+        live = TwitterUser.objects.participating_users(schedule=schedule).details(schedule=schedule)
+
+        mismatches = 0
+        for user in live:
+            standing = stored.pop(user.id, None)
+            expected = tuple(getattr(user, field) for field in COMPARED_FIELDS)
+            actual = tuple(getattr(standing, field) for field in COMPARED_FIELDS) if standing else None
+            if actual != expected or abs(standing.avg_finish - user.avg_finish) > 1e-6:
+                mismatches += 1
+                self.stderr.write(f'{schedule}: {user} expected {expected}, stored {actual}')
+        for standing in stored.values():
+            mismatches += 1
+            self.stderr.write(f'{schedule}: {standing.user_id} has a standing but no picks')
+        return mismatches
@@ -0,0 +1,129 @@
+import asyncio
+import datetime
+import time
+
+import aiohttp
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
+
+from fantasy_racing.picks import profiles
+from fantasy_racing.picks import edge
+from fantasy_racing.picks.models import TwitterUser
+from fantasy_racing.utils import twitter
+
+
+SAVED_FIELDS = profiles.PROFILE_FIELDS + ('profile_updated', 'profile_refresh_requested')
+
+# Failed lookups are retried after 5, 10 and 20 seconds before the run gives up on the queue for now.
+# Rate limited ones back off the same way, up to 40 seconds, when Twitter's reset time has already passed.
+RETRIES = 3
+RETRY_DELAY = 5
+
+
+class Command(BaseCommand):
+    help = (
+        'Refresh queued Twitter profiles in batches through the PROFILE_REFRESH_BACKEND, waiting out rate limits. '
+        'Interrupted runs resume from the queue.'
+    )
+
+    # Swapped out by the tests
+    sleep = staticmethod(time.sleep)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', dest='all_users', help='Queue every user first')
+        parser.add_argument(
+            '--stale', action='store_true',
+            help='Queue every user whose profile is older than TWITTER_PROFILE_TTL first'
+        )
+        parser.add_argument('--batch-size', type=int, default=profiles.BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep draining the queue as a worker')
+        parser.add_argument('--interval', type=int, default=60, help='Seconds between queue checks with --loop')
+
+    def handle(self, *args, all_users=False, stale=False, batch_size=profiles.BATCH_SIZE, loop=False, interval=60,
+               **options):
+        if not 0 < batch_size <= profiles.BATCH_SIZE:
+            raise CommandError(f'--batch-size must be between 1 and {profiles.BATCH_SIZE}')
+
+        users = TwitterUser.objects.all()
+        if stale:
+            updated_before = timezone.now() - datetime.timedelta(seconds=settings.TWITTER_PROFILE_TTL)
+            users = users.filter(
+                models.Q(profile_updated__isnull=True) | models.Q(profile_updated__lt=updated_before)
+            )
+        if all_users or stale:
+            self.stdout.write(f'Queued {users.request_profile_refresh()} users')
+
+        backend = profiles.get_backend()
+        try:
+            while True:
+                self.drain(backend, batch_size)
+                if not loop:
+                    break
+                self.sleep(interval)
+        finally:
+            backend.close()
+
+    def drain(self, backend: profiles.ProfileBackend, batch_size: int):
+        """Refresh everything queued, one keyset page of users per backend call
+        """
+        queued = TwitterUser.objects.filter(profile_refresh_requested__isnull=False).order_by('id')
+        last_id, refreshed, changed, started = 0, 0, 0, time.perf_counter()
+        failures, limited = 0, 0
+        while True:
+            users = list(queued.filter(id__gt=last_id)[:batch_size])
+            if not users:
+                break
+
+            self.wait_until(backend.resume_at)
+            try:
+                found = backend.lookup([user.id for user in users])
+            except twitter.RateLimited as e:
+                self.wait_until(max(e.reset or 0, time.time() + RETRY_DELAY * 2 ** min(limited, RETRIES)))
+                limited += 1
+                continue
+            except (twitter.TwitterError, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # The batch stays queued, so a later run or the next --loop pass picks it up
+                if failures == RETRIES:
+                    self.stderr.write(f'Lookup failed {failures + 1} times, leaving {queued.count()} users queued: {e}')
+                    break
+                delay = RETRY_DELAY * 2 ** failures
+                failures += 1
+                self.stderr.write(f'Lookup failed, retrying in {delay}s: {e}')
+                self.sleep(delay)
+                continue
+            failures, limited = 0, 0
+
+            batch_changed = profiles.apply_profiles(users, found)
+            self.save(users)
+            if batch_changed:
+                edge.purge(*TwitterUser.objects.filter(id__in=[user.id for user in batch_changed]).page_keys())
+            last_id = users[-1].id
+            refreshed += len(users)
+            changed += len(batch_changed)
+
+        if refreshed:
+            self.stdout.write(
+                f'Refreshed {refreshed} profiles, {changed} changed, in {time.perf_counter() - started:.1f}s'
+            )
+
+    def save(self, users: list):
+        try:
+            with transaction.atomic():
+                TwitterUser.objects.bulk_update(users, SAVED_FIELDS)
+        except IntegrityError:
+            # Usernames that moved between users in the same batch, fall back to one row at a time
+            for user in users:
+                try:
+                    with transaction.atomic():
+                        user.save(update_fields=SAVED_FIELDS)
+                except IntegrityError:
+                    self.stderr.write(f'Could not rename {user.id} to @{user.username}, it is taken')
+                    TwitterUser.objects.filter(id=user.id).update(profile_refresh_requested=None)
+
+    def wait_until(self, resume_at: float = None):
+        wait = (resume_at or 0) - time.time()
+        if wait > 0:
+            self.stdout.write(f'Rate limited, waiting {wait:.0f}s')
+            self.sleep(wait)
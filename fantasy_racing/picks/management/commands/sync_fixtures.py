@@ -0,0 +1,145 @@
+from collections import defaultdict
+from pathlib import Path
+import time
+from typing import Dict, List
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, models, transaction
+import yaml
+
+from fantasy_racing.picks import edge
+from fantasy_racing.picks.models import Race, RaceDriver
+
+
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class ModelRows:
+    """Every stored row of a model, loaded once and indexed by primary key and natural key
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+        self.load()
+
+    def load(self):
+        self.by_pk = {row.pk: row for row in self.model._default_manager.all()}
+        self.by_natural_key = {}
+        if hasattr(self.model, 'natural_key'):
+            self.by_natural_key = {row.natural_key(): row for row in self.by_pk.values()}
+
+    def natural_key(self, row: models.Model) -> tuple:
+        return row.natural_key() if hasattr(self.model, 'natural_key') else None
+
+
+class Command(BaseCommand):
+    help = (
+        'Idempotently load YAML fixtures: parse them once, diff them against the database in bulk and only '
+        'insert or update the rows that differ. A drop-in replacement for loaddata on the fixtures directory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='+', type=Path, help='Fixture files, loaded in the order given')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them')
+
+    def handle(self, *args, paths: List[Path], dry_run=False, **options):
+        started = time.perf_counter()
+        objects = []
+        for path in paths:
+            with open(path) as f:
+                objects.extend(yaml.load(f, Loader=Loader) or [])
+
+        # Models are synced in the order they first appear, so related models come first as with loaddata
+        by_model: Dict[type, list] = defaultdict(list)
+        for obj in objects:
+            try:
+                by_model[apps.get_model(obj['model'])].append(obj)
+            except LookupError as e:
+                raise CommandError(f'Unknown model in fixtures: {e}')
+
+        rows: Dict[type, ModelRows] = {}
+        changed_models = []
+        with transaction.atomic():
+            for model, model_objects in by_model.items():
+                rows[model] = ModelRows(model)
+                created, updated = self.sync_model(model, model_objects, rows, dry_run)
+                if created or updated:
+                    changed_models.append(model)
+                self.stdout.write(
+                    f'{model._meta.label}: {len(model_objects)} objects, {created} created, {updated} updated'
+                )
+
+        if changed_models and not dry_run:
+            # Bulk writes skip the signals that would otherwise clear these
+            edge.purge(edge.ALL_PAGES)
+            RaceDriver.objects.clear_roster()
+            Race.objects.clear_upcoming()
+        self.stdout.write(self.style.SUCCESS(
+            f'Synced {len(objects)} objects from {len(paths)} files in {time.perf_counter() - started:.2f}s'
+        ))
+
+    def sync_model(self, model, objects: list, rows: Dict[type, ModelRows], dry_run: bool) -> tuple:
+        stored = rows[model]
+        to_create, to_update, updated_fields = [], [], set()
+        for obj in objects:
+            instance = self.build(model, obj, rows)
+            existing = stored.by_pk.get(instance.pk) if instance.pk is not None \
+                else stored.by_natural_key.get(stored.natural_key(instance))
+            if existing is None:
+                to_create.append(instance)
+                continue
+
+            # Only the fields the fixture sets are compared, anything else on the row is left alone
+            given = {model._meta.get_field(name).attname for name in obj.get('fields', {})}
+            changed = [
+                field.attname for field in stored.fields
+                if field.attname in given and getattr(existing, field.attname) != getattr(instance, field.attname)
+            ]
+            if changed:
+                for attname in changed:
+                    setattr(existing, attname, getattr(instance, attname))
+                to_update.append(existing)
+                updated_fields.update(changed)
+
+        if dry_run:
+            # Let later models resolve natural keys of rows that would have been created
+            for instance in to_create:
+                stored.by_natural_key.setdefault(stored.natural_key(instance), instance)
+        else:
+            model._default_manager.bulk_create(to_create)
+            if to_update:
+                model._default_manager.bulk_update(to_update, sorted(updated_fields))
+            if any(instance.pk is not None for instance in to_create):
+                # Explicit primary keys leave Postgres sequences behind, as loaddata would reset them
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(no_style(), [model]):
+                        cursor.execute(sql)
+            if to_create:
+                # Newly created rows need their keys for the foreign keys of models synced later
+                stored.load()
+        return len(to_create), len(to_update)
+
+    @staticmethod
+    def build(model, obj: dict, rows: Dict[type, ModelRows]) -> models.Model:
+        """An unsaved instance from a fixture object, with natural foreign keys resolved from `rows`
+        """
+        values = {}
+        for name, value in obj.get('fields', {}).items():
+            field = model._meta.get_field(name)
+            if field.many_to_many:
+                raise CommandError(f'{model._meta.label}.{name}: many-to-many fields are not supported')
+            if field.is_relation:
+                if isinstance(value, list):
+                    if field.related_model not in rows:
+                        rows[field.related_model] = ModelRows(field.related_model)
+                    target = rows[field.related_model].by_natural_key.get(tuple(value))
+                    if target is None:
+                        raise CommandError(f'{model._meta.label}.{name}: no {field.related_model._meta.label} {value}')
+                    value = target.pk
+                values[field.attname] = value
+            else:
+                values[field.attname] = field.to_python(value)
+        return model(pk=obj.get('pk'), **values)
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from fantasy_racing.picks import engine
+from fantasy_racing.picks.models import Race
+
+
+class Command(BaseCommand):
+    help = 'Redraw seeded picks with the pick engine and report any that do not match the stored driver'
+
+    def add_arguments(self, parser):
+        parser.add_argument('race_ids', nargs='*', type=int, help='Races to verify')
+        parser.add_argument('--year', type=int, help='Verify every race in a season')
+
+    def handle(self, *args, race_ids=None, year=None, **options):
+        races = Race.objects.select_related('schedule')
+        if race_ids:
+            races = races.filter(id__in=race_ids)
+        elif year:
+            races = races.filter(schedule__year=year)
+        else:
+            raise CommandError('Provide race IDs or --year')
+
+        mismatches = 0
+        for race in races:
+            started = time.perf_counter()
+            bad_picks = engine.verify_race(race)
+            elapsed = (time.perf_counter() - started) * 1000
+            mismatches += len(bad_picks)
+            self.stdout.write(f'{race}: {len(bad_picks)} mismatched picks, verified in {elapsed:.1f}ms')
+            for pick in bad_picks:
+                self.stderr.write(f'  pick {pick.id} for user {pick.user_id} does not match its seed')
+
+        if mismatches:
+            raise CommandError(f'{mismatches} picks do not match their seeds')
+        self.stdout.write(self.style.SUCCESS('All seeded picks verified'))
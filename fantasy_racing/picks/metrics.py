@@ -0,0 +1,292 @@
+"""Opt-in per-request metrics
+
+`RequestMetricsMiddleware` records wall time, DB query count, DB time and template render time for every
+request, keyed by the resolved URL name. Each request is logged to the `fantasy_racing.metrics` logger and
+reported in a `Server-Timing` header. Each process also folds requests into rolling histograms and flushes
+them to `REQUEST_METRICS_DIR`, where the `dump_metrics` command merges them across workers and files left
+by workers that have since exited are pruned once their windows expire. Querysets evaluated while a template
+renders count towards both DB and template time.
+
+The middleware runs natively under both WSGI and ASGI. Timings are kept in a context variable, which
+`sync_to_async` carries into the thread running the ORM, so concurrent async requests sharing that thread
+are each counted separately.
+
+The middleware is only added to `MIDDLEWARE` when `REQUEST_METRICS` is on, so nothing here runs otherwise.
+"""
+import asyncio
+import bisect
+import contextvars
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.template.backends.django import Template
+
+
+logger = logging.getLogger('fantasy_racing.metrics')
+
+METRICS = ('total_ms', 'db_ms', 'template_ms', 'queries')
+
+# Bucket upper bounds shared by every metric, milliseconds for timings and a plain count for queries
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf'))
+
+# Timings of the request being handled, None outside of instrumented requests
+_timings = contextvars.ContextVar('timings', default=None)
+
+
+class Histogram:
+    """Fixed bucket histogram that can be merged and stored as JSON
+    """
+
+    def __init__(self, counts: Optional[list] = None, total: float = 0, maximum: float = 0):
+        self.counts = counts or [0] * len(BUCKETS)
+        self.total = total
+        self.maximum = maximum
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def add(self, value: float):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def merge(self, other: 'Histogram'):
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, other.counts)]
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the percentile, capped at the largest value seen
+        """
+        rank, seen = pct / 100 * self.count, 0
+        for bound, count in zip(BUCKETS, self.counts):
+            seen += count
+            if count and seen >= rank:
+                return min(bound, self.maximum)
+        return self.maximum
+
+    def summary(self) -> dict:
+        count = self.count
+        return {
+            'count': count,
+            'mean': round(self.total / count, 3) if count else 0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': round(self.maximum, 3),
+        }
+
+    def to_dict(self) -> dict:
+        return {'counts': self.counts, 'total': self.total, 'max': self.maximum}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Histogram':
+        return cls(counts=data['counts'], total=data['total'], maximum=data['max'])
+
+
+class Registry:
+    """Histograms of this process by window start, URL name and metric
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.windows: Dict[int, Dict[str, Dict[str, Histogram]]] = {}
+        self.last_flush = self.started = time.time()
+
+    def record(self, view_name: str, values: dict):
+        now = time.time()
+        window = int(now // settings.REQUEST_METRICS_WINDOW * settings.REQUEST_METRICS_WINDOW)
+        with self.lock:
+            views = self.windows.setdefault(window, {})
+            histograms = views.setdefault(view_name, {metric: Histogram() for metric in METRICS})
+            for metric in METRICS:
+                histograms[metric].add(values[metric])
+            if now - self.last_flush >= settings.REQUEST_METRICS_FLUSH_INTERVAL:
+                self.flush(now)
+
+    def flush(self, now: Optional[float] = None):
+        """Drop expired windows and write the rest to this process' file. Callers hold the lock.
+        """
+        now = now or time.time()
+        oldest = now - settings.REQUEST_METRICS_RETENTION
+        self.windows = {window: views for window, views in self.windows.items() if window >= oldest}
+        data = {
+            str(window): {
+                view: {metric: histogram.to_dict() for metric, histogram in histograms.items()}
+                for view, histograms in views.items()
+            }
+            for window, views in self.windows.items()
+        }
+
+        os.makedirs(settings.REQUEST_METRICS_DIR, exist_ok=True)
+        # Keyed by start time too, so a new worker reusing a PID does not overwrite the old one's windows
+        path = os.path.join(settings.REQUEST_METRICS_DIR, f'{os.getpid()}-{int(self.started)}.json')
+        # Written aside and renamed so the dump command never reads half a file
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(data, f)
+        os.replace(f'{path}.tmp', path)
+        prune(settings.REQUEST_METRICS_DIR, oldest)
+        self.last_flush = now
+
+
+registry = Registry()
+
+
+def prune(directory: str, oldest: float):
+    """Delete files of workers that exited before `oldest`, since every window in them has expired
+    """
+    for path in glob.glob(os.path.join(directory, '*.json*')):
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.remove(path)
+        except FileNotFoundError:
+            # Another worker pruned it first
+            pass
+
+
+def load(directory: str, since: float = 0) -> Dict[str, Dict[str, Histogram]]:
+    """Merge the flushed histograms of every process, skipping windows that started before `since`
+    """
+    merged: Dict[str, Dict[str, Histogram]] = {}
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        with open(path) as f:
+            windows = json.load(f)
+        for window, views in windows.items():
+            if int(window) < since:
+                continue
+            for view, histograms in views.items():
+                target = merged.setdefault(view, {metric: Histogram() for metric in METRICS})
+                for metric, data in histograms.items():
+                    target[metric].merge(Histogram.from_dict(data))
+    return merged
+
+
+class Timings:
+    """Query count, DB time and template time of one request
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+
+
+def time_query(execute, sql, params, many, context):
+    """Database execute wrapper adding up the number and duration of the current request's queries
+    """
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_seconds += time.perf_counter() - started
+        timings.queries += 1
+
+
+def instrument_connections():
+    """Add `time_query` to the connections of this thread, where it stays for later requests
+    """
+    for conn in connections.all():
+        if time_query not in conn.execute_wrappers:
+            # First so that popping a wrapper added later with `execute_wrapper()` leaves it in place
+            conn.execute_wrappers.insert(0, time_query)
+
+
+def instrument_templates():
+    """Time `render` of the Django template backend, which covers `render()` and `render_to_string()`
+    but not the includes inside a template, so nothing is counted twice
+    """
+    if getattr(Template.render, 'instrumented', False):
+        return
+    render = Template.render
+
+    def timed_render(self, *args, **kwargs):
+        timings = _timings.get()
+        if timings is None:
+            return render(self, *args, **kwargs)
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            timings.template_seconds += time.perf_counter() - started
+
+    timed_render.instrumented = True
+    Template.render = timed_render
+
+
+def server_timing(values: dict) -> str:
+    return ', '.join([
+        f'db;dur={values["db_ms"]:.1f};desc="{values["queries"]} queries"',
+        f'tpl;dur={values["template_ms"]:.1f}',
+        f'total;dur={values["total_ms"]:.1f}',
+    ])
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Tells Django to await this middleware rather than run it in a thread
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        instrument_templates()
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if self.is_async:
+            return self.__acall__(request)
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            instrument_connections()
+            response = self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, started)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        timings = Timings()
+        token = _timings.set(timings)
+        started = time.perf_counter()
+        try:
+            # Connections belong to a thread, so instrument the one sync views and ORM calls run in
+            await sync_to_async(instrument_connections)()
+            response = await self.get_response(request)
+        finally:
+            _timings.reset(token)
+        return self.report(request, response, timings, started)
+
+    @staticmethod
+    def report(request: HttpRequest, response: HttpResponse, timings: Timings, started: float) -> HttpResponse:
+        match = request.resolver_match
+        view_name = match.view_name if match else 'unresolved'
+        values = {
+            'total_ms': (time.perf_counter() - started) * 1000,
+            'db_ms': timings.db_seconds * 1000,
+            'template_ms': timings.template_seconds * 1000,
+            'queries': timings.queries,
+        }
+        response['Server-Timing'] = server_timing(values)
+        logger.info(
+            'view=%s method=%s status=%s total_ms=%.1f db_ms=%.1f template_ms=%.1f queries=%d',
+            view_name, request.method, response.status_code,
+            values['total_ms'], values['db_ms'], values['template_ms'], values['queries'],
+            extra={'metrics': dict(values, view=view_name, status=response.status_code)},
+        )
+        registry.record(view_name, values)
+        return response
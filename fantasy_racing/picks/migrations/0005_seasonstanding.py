@@ -0,0 +1,63 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:25
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+def populate_standings(apps, schema_editor):
+    RacePick = apps.get_model('picks', 'RacePick')
+    SeasonStanding = apps.get_model('picks', 'SeasonStanding')
+    rows = RacePick.objects.order_by().values('user', 'race__schedule').annotate(
+        starts=models.Count('id'),
+        wins=models.Count('id', filter=models.Q(result__position=1)),
+        podiums=models.Count('id', filter=models.Q(result__position__lte=3)),
+        top_10s=models.Count('id', filter=models.Q(result__position__lte=10)),
+        finish_sum=Coalesce(models.Sum('result__position'), 0),
+        finish_count=models.Count('result'),
+        points=Coalesce(models.Sum('result__points'), 0),
+    )
+    SeasonStanding.objects.bulk_create([
+        SeasonStanding(user_id=row.pop('user'), schedule_id=row.pop('race__schedule'), **row)
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0004_racepick_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeasonStanding',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('points', models.IntegerField(default=0)),
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('podiums', models.PositiveIntegerField(default=0)),
+                ('top_10s', models.PositiveIntegerField(default=0)),
+                ('finish_sum', models.PositiveIntegerField(default=0, help_text='Sum of finishing positions of resulted picks')),
+                ('finish_count', models.PositiveIntegerField(default=0, help_text='Number of resulted picks')),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='picks.schedule')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='standings', to='picks.twitteruser')),
+            ],
+            options={
+                'verbose_name': 'Season Standing',
+                'verbose_name_plural': 'Season Standings',
+                'ordering': ('schedule', '-points', 'user'),
+                'default_related_name': 'standings',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='seasonstanding',
+            index=models.Index(fields=['schedule', '-points', 'user'], name='standing_schedule_points_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='seasonstanding',
+            unique_together={('schedule', 'user')},
+        ),
+        migrations.RunPython(populate_standings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0005_seasonstanding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='racepick',
+            name='seed',
+            field=models.BigIntegerField(blank=True, help_text='Seed the pick was drawn from, if drawn by the pick engine', null=True),
+        ),
+    ]
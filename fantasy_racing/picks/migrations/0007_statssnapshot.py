@@ -0,0 +1,27 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:31
+
+from django.db import migrations, models
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0006_racepick_seed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, db_index=True)),
+                ('data', models.JSONField()),
+            ],
+            options={
+                'verbose_name': 'Statistics Snapshot',
+                'verbose_name_plural': 'Statistics Snapshots',
+                'get_latest_by': 'created',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0007_statssnapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['date'], name='race_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['schedule', 'date'], name='race_schedule_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='racepick',
+            index=models.Index(fields=['race', 'driver'], name='pick_race_driver_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='racepick',
+            index=models.Index(fields=['user', 'race'], name='pick_user_race_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='raceresult',
+            index=models.Index(condition=models.Q(('position__lte', 10)), fields=['position', 'points'], name='result_top_10_idx'),
+        ),
+    ]
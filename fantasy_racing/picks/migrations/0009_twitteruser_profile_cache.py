@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twitteruser',
+            name='profile_refresh_requested',
+            field=models.DateTimeField(blank=True, db_index=True, help_text='Set while the profile is queued for a background refresh', null=True),
+        ),
+        migrations.AddField(
+            model_name='twitteruser',
+            name='profile_updated',
+            field=models.DateTimeField(blank=True, help_text='When the profile was last fetched from Twitter', null=True),
+        ),
+    ]
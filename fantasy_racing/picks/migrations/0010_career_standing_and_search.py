@@ -0,0 +1,73 @@
+# Generated by Django 3.2.8 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+
+
+STANDING_FIELDS = ('points', 'starts', 'wins', 'podiums', 'top_10s', 'finish_sum', 'finish_count')
+
+
+def populate_careers(apps, schema_editor):
+    SeasonStanding = apps.get_model('picks', 'SeasonStanding')
+    CareerStanding = apps.get_model('picks', 'CareerStanding')
+    rows = SeasonStanding.objects.order_by().values('user').annotate(
+        **{field: models.Sum(field) for field in STANDING_FIELDS}
+    )
+    CareerStanding.objects.bulk_create([
+        CareerStanding(
+            user_id=row.pop('user'), avg_finish=row['finish_sum'] / row['finish_count'] if row['finish_count'] else 0.0,
+            **row
+        )
+        for row in rows
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0009_twitteruser_profile_cache'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CareerStanding',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='career', serialize=False, to='picks.twitteruser')),
+                ('points', models.IntegerField(default=0)),
+                ('starts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('podiums', models.PositiveIntegerField(default=0)),
+                ('top_10s', models.PositiveIntegerField(default=0)),
+                ('finish_sum', models.PositiveIntegerField(default=0, help_text='Sum of finishing positions of resulted picks')),
+                ('finish_count', models.PositiveIntegerField(default=0, help_text='Number of resulted picks')),
+                ('avg_finish', models.FloatField(default=0.0)),
+            ],
+            options={
+                'verbose_name': 'Career Standing',
+                'verbose_name_plural': 'Career Standings',
+                'ordering': ('-starts', 'avg_finish', 'user'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='twitteruser',
+            index=models.Index(django.db.models.functions.text.Upper('username'), name='twitteruser_username_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twitteruser',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='twitteruser_name_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='careerstanding',
+            index=models.Index(fields=['-starts', 'avg_finish', 'user'], name='career_starts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='careerstanding',
+            index=models.Index(fields=['-points', 'user'], name='career_points_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='careerstanding',
+            index=models.Index(condition=models.Q(('finish_count__gt', 0)), fields=['avg_finish', 'user'], name='career_avg_finish_idx'),
+        ),
+        migrations.RunPython(populate_careers, migrations.RunPython.noop),
+    ]
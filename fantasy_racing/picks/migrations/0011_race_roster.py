@@ -0,0 +1,18 @@
+# Generated by Django 3.2.8 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0010_career_standing_and_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='roster',
+            field=models.JSONField(blank=True, editable=False, help_text='IDs of the drivers picks are drawn from, in draw order. Stored by the first pick.', null=True),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:32
+
+from django.db import migrations, models
+import django.utils.timezone
+import time
+
+
+def create_data_version(apps, schema_editor):
+    apps.get_model('picks', 'DataVersion').objects.get_or_create(id=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0011_race_roster'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.BigIntegerField(default=time.time_ns)),
+                ('changed', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Data Version',
+                'verbose_name_plural': 'Data Versions',
+            },
+        ),
+        migrations.RunPython(create_data_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0012_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='results_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Moves whenever the standings are rebuilt from picks and results'),
+        ),
+        migrations.AddField(
+            model_name='schedule',
+            name='standings_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False, help_text='Moves whenever the standings table changes'),
+        ),
+    ]
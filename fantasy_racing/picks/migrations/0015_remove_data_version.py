@@ -0,0 +1,16 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:46
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0014_page_version'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='DataVersion',
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 3.2.8 on 2026-10-18 12:48
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('picks', '0015_remove_data_version'),
+    ]
+
+    operations = [
+        # SQLite rebuilds the table to change the column, which can't carry expression indexes across
+        migrations.RemoveIndex(
+            model_name='twitteruser',
+            name='twitteruser_username_upper_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='twitteruser',
+            name='twitteruser_name_upper_idx',
+        ),
+        migrations.AlterField(
+            model_name='twitteruser',
+            name='id',
+            field=models.PositiveBigIntegerField(primary_key=True, serialize=False, unique=True, verbose_name='Twitter ID'),
+        ),
+        migrations.AddIndex(
+            model_name='twitteruser',
+            index=models.Index(django.db.models.functions.text.Upper('username'), name='twitteruser_username_upper_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='twitteruser',
+            index=models.Index(django.db.models.functions.text.Upper('name'), name='twitteruser_name_upper_idx'),
+        ),
+    ]
@@ -1,13 +1,19 @@
+import copy
+import datetime
 import random
+import time
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models.functions import Coalesce
-from django.db.models.signals import post_save
+from django.db import models, transaction
+from django.db.models.functions import Coalesce, Upper
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.utils import timezone
 from django_extensions.db.fields import CreationDateTimeField
 
+from . import edge
+
 
 class FAQ(models.Model):
 
@@ -51,12 +57,58 @@ class RaceTeam(models.Model):
 
 class RaceDriverManager(models.Manager):
 
+    # Shared by every process-local manager, cleared whenever a driver is saved or deleted. The TTL
+    # bounds how long other worker processes can keep serving a roster that changed elsewhere.
+    _roster = None
+    _roster_expires = 0.0
+    # Race ID -> the roster its picks are drawn from. Those never change once stored, so they don't expire.
+    _race_rosters = {}
+
     def get_by_natural_key(self, first_name, last_name):
         return self.get(first_name=first_name, last_name=last_name)
-    
+
+    def active_roster(self) -> list:
+        """Active drivers ordered by ID, cached in-process
+        """
+        if RaceDriverManager._roster is None or time.monotonic() > RaceDriverManager._roster_expires:
+            RaceDriverManager._roster = list(self.model.objects.filter(is_active=True).order_by('id'))
+            RaceDriverManager._roster_expires = time.monotonic() + settings.DRIVER_ROSTER_TTL
+        return RaceDriverManager._roster
+
+    def race_roster(self, race: 'Race') -> list:
+        """The drivers a race's picks are drawn from, stored from the active roster by its first draw
+        """
+        roster = RaceDriverManager._race_rosters.get(race.id)
+        if roster is None:
+            active = [driver.id for driver in self.active_roster()]
+            # Only the first draw stores it, concurrent ones read back whichever got there first
+            Race.objects.filter(id=race.id, roster__isnull=True).update(roster=active)
+            roster = self.in_roster_order(Race.objects.values_list('roster', flat=True).get(id=race.id))
+            if not roster:
+                # Every stored driver has since been deleted, so the race starts over from the active roster
+                Race.objects.filter(id=race.id).update(roster=active)
+                roster = list(self.active_roster())
+            RaceDriverManager._race_rosters[race.id] = roster
+        return roster
+
+    def in_roster_order(self, driver_ids: list) -> list:
+        """The drivers of a stored roster in its order, leaving out any deleted since. Drivers with picks
+        are protected from deletion, so only drivers nobody was drawn can drop out.
+        """
+        drivers = self.in_bulk(driver_ids)
+        return [drivers[driver_id] for driver_id in driver_ids if driver_id in drivers]
+
+    def clear_roster(self):
+        RaceDriverManager._roster = None
+        RaceDriverManager._race_rosters = {}
+
     def random(self):
-        active_driver_ids = list(self.filter(is_active=True).values_list('id', flat=True))
-        return self.get(id=random.choice(active_driver_ids))
+        return copy.copy(random.choice(self.active_roster()))
+
+    def random_many(self, n: int) -> list:
+        """Draw `n` drivers with replacement, e.g. for simulations and load tests
+        """
+        return [copy.copy(driver) for driver in random.choices(self.active_roster(), k=n)]
 
 
 class RaceDriver(models.Model):
@@ -95,11 +147,27 @@ class ScheduleManager(models.Manager):
     def get_by_natural_key(self, year):
         return self.get(year=year)
 
+    def standings_changed(self, schedule_id: int, results: bool = True):
+        """Move on the versions in-process copies of the season's standings are checked against
+        """
+        versions = {'standings_version': models.F('standings_version') + 1}
+        if results:
+            versions['results_version'] = models.F('results_version') + 1
+        self.filter(id=schedule_id).update(**versions)
+
 
 class Schedule(models.Model):
 
     year = models.PositiveIntegerField(unique=True)
 
+    standings_version = models.PositiveBigIntegerField(
+        default=0, editable=False, help_text='Moves whenever the standings table changes'
+    )
+
+    results_version = models.PositiveBigIntegerField(
+        default=0, editable=False, help_text='Moves whenever the standings are rebuilt from picks and results'
+    )
+
     objects = ScheduleManager()
 
     class Meta:
@@ -112,21 +180,104 @@ class Schedule(models.Model):
         return str(self.year)
     
     @property
-    def races_complete(self):
-        return self.races.filter(date__lte=timezone.now().date()).count()
-
+    def is_finished(self) -> bool:
+        """Whether every race has been run, from the cached upcoming races
+        """
+        return Race.objects.current(schedule_id=self.id) is None
+
+    def race_listing(self) -> list:
+        return self.races.listing()
+
+
+class RaceQuerySet(models.QuerySet):
+
+    def with_state(self):
+        """Annotate whether each race is viewable and current, from its schedule's next race date
+        """
+        current_date = Race.objects.filter(schedule=models.OuterRef('schedule'), date__gte=timezone.now().date()) \
+                                   .order_by('date').values('date')[:1]
+        return self.annotate(current_date=models.Subquery(current_date)).annotate(
+            _is_current=models.Case(
+                models.When(date=models.F('current_date'), then=True), default=False, output_field=models.BooleanField(),
+            ),
+            _is_viewable=models.Case(
+                models.When(models.Q(current_date__isnull=True) | models.Q(date__lte=models.F('current_date')), then=True),
+                default=False, output_field=models.BooleanField(),
+            ),
+        )
 
-class RaceManager(models.Manager):
+    def listing(self) -> list:
+        """Whole schedules of races with their index, pick count and viewable/current state
+        precomputed, all from a single query
+        """
+        races = list(self.select_related('schedule') \
+                         .annotate(num_picks=models.Count('picks')) \
+                         .order_by('schedule', 'date'))
+        today = timezone.now().date()
+        currents, counts = {}, {}
+        for race in races:
+            if race.date >= today:
+                currents.setdefault(race.schedule_id, race)
+        for race in races:
+            current = currents.get(race.schedule_id)
+            race._idx = counts[race.schedule_id] = counts.get(race.schedule_id, -1) + 1
+            race._is_current = race is current
+            race._is_viewable = current is None or race.date <= current.date
+        return races
+
+
+class RaceManager(models.Manager.from_queryset(RaceQuerySet)):
+
+    # The next race of every schedule with races left, shared by every process-local manager like the
+    # driver roster. It is cleared whenever a race is saved or deleted and expires at the next boundary
+    # that can change it: midnight UTC, a submission deadline, or the TTL for writes made elsewhere.
+    _upcoming = None
+    _upcoming_expires = None
 
     def get_by_natural_key(self, date):
         return self.get(date=date)
 
+    def with_schedule(self, id: int = None):
+        """Fetch a race, the current one by default, alongside a listing of every race in its schedule
+        """
+        races = self.filter(id=id) if id is not None else self.filter(date__gte=timezone.now().date())
+        listing = self.filter(schedule=models.Subquery(races.values('schedule')[:1])).listing()
+        race = next((race for race in listing if (race.id == id if id is not None else race.is_current)), None)
+        return race, listing
+
     def viewable(self):
         current: Race = self.current()
-        return self.filter(date__lte=current.date)
-    
-    def current(self):
-        return self.filter(date__gte=timezone.now().date()).first()
+        # Once a season is over every race in it can be viewed
+        return self.filter(date__lte=current.date) if current else self.all()
+
+    def upcoming(self) -> dict:
+        """The current race of every schedule that has races left, keyed by schedule ID and cached in-process
+        """
+        now = timezone.now()
+        if RaceManager._upcoming is None or now >= RaceManager._upcoming_expires:
+            upcoming = {}
+            for race in self.model.objects.filter(date__gte=now.date()).select_related('schedule').order_by('date', 'id'):
+                upcoming.setdefault(race.schedule_id, race)
+            midnight = datetime.datetime.combine(now.date() + datetime.timedelta(days=1), datetime.time(), now.tzinfo)
+            deadlines = [race.submit_by for race in upcoming.values() if race.submit_by > now]
+            RaceManager._upcoming = upcoming
+            RaceManager._upcoming_expires = min(
+                [midnight, now + datetime.timedelta(seconds=settings.CURRENT_RACE_TTL)] + deadlines
+            )
+        return RaceManager._upcoming
+
+    def clear_upcoming(self):
+        RaceManager._upcoming = None
+
+    def current(self, schedule_id: int = None):
+        """The next race to be run, or the next one within a schedule, without querying while cached
+        """
+        upcoming = self.upcoming()
+        if schedule_id is not None:
+            race = upcoming.get(schedule_id)
+        else:
+            race = min(upcoming.values(), key=lambda race: (race.date, race.id), default=None)
+        return copy.copy(race)
 
 
 class Race(models.Model):
@@ -139,10 +290,20 @@ class Race(models.Model):
 
     submit_by = models.DateTimeField(help_text='Time that things must be submitted by in UTC')
 
+    roster = models.JSONField(
+        null=True, blank=True, editable=False,
+        help_text='IDs of the drivers picks are drawn from, in draw order. Stored by the first pick.'
+    )
+
     objects = RaceManager()
 
     class Meta:
         default_related_name = 'races'
+        indexes = [
+            # Current race lookups scan by date, schedule listings by (schedule, date)
+            models.Index(fields=['date'], name='race_date_idx'),
+            models.Index(fields=['schedule', 'date'], name='race_schedule_date_idx'),
+        ]
         ordering = ('date',)
     
     def clean(self) -> None:
@@ -154,19 +315,30 @@ class Race(models.Model):
     
     @property
     def is_viewable(self):
-        return self.schedule.races.viewable().filter(id=self.id).exists()
+        if hasattr(self, '_is_viewable'):
+            return self._is_viewable
+        current = Race.objects.current(schedule_id=self.schedule_id)
+        return current is None or self.date <= current.date
     
     @property
     def is_current(self):
-        return self.schedule.races.current() == self
+        if hasattr(self, '_is_current'):
+            return self._is_current
+        return Race.objects.current(schedule_id=self.schedule_id) == self
+
+    @property
+    def submissions_open(self) -> bool:
+        return timezone.now() < self.submit_by
     
     @property
     def idx(self):
-        race_ids = list(self.schedule.races.values_list('id', flat=True))
-        return race_ids.index(self.id)
+        if not hasattr(self, '_idx'):
+            self._idx = self.schedule.races.filter(date__lt=self.date).count()
+        return self._idx
     
     def __str__(self) -> str:
-        return f'{self.track} in {self.schedule.year}'
+        # A race's date is always in its schedule's year (see `clean`), so there's no need to load the schedule
+        return f'{self.track} in {self.date.year}'
 
 
 class TwitterUserQuerySet(models.QuerySet):
@@ -194,14 +366,50 @@ class TwitterUserQuerySet(models.QuerySet):
             points=Coalesce(models.Sum('picks__result__points', filter=with_schedule_q(None)), 0)
         )
 
+    def search(self, term: str):
+        """Users whose username or name starts with `term`, ignoring case as the database folds it
+        """
+        term = term.lstrip('@')
+        if not term:
+            return self
+        if not term.isascii():
+            # Python and the database disagree on the case of non-ASCII letters (SQLite folds only ASCII),
+            # so the database folds the term too and the uppercase indexes are not used.
+            prefix = Upper(models.Value(term))
+            matches = models.Q(username_upper__startswith=prefix) | models.Q(name_upper__startswith=prefix)
+            return self.annotate(username_upper=Upper('username'), name_upper=Upper('name')).filter(matches)
+        prefix = term.upper()
+        # A range over the uppercase indexes rather than LIKE, which an index can only serve with pattern
+        # operator classes on Postgres and not at all on SQLite. The prefix filter keeps non-C collations exact.
+        end = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        matches = models.Q()
+        for field in ('username', 'name'):
+            matches |= models.Q(**{
+                f'{field}_upper__gte': prefix, f'{field}_upper__lt': end, f'{field}_upper__startswith': prefix,
+            })
+        return self.annotate(username_upper=Upper('username'), name_upper=Upper('name')).filter(matches)
+
     def participating_users(self, schedule: Schedule):
         return self.with_start_count(schedule=schedule) \
                    .filter(starts__gt=0).all()
 
+    def page_keys(self) -> list:
+        """Surrogate keys of the pages showing these users: their own and those of every season they played
+        """
+        years = SeasonStanding.objects.filter(user__in=self.values('id')).order_by() \
+                                      .values_list('schedule__year', flat=True).distinct()
+        return [edge.user_key(user_id) for user_id in self.values_list('id', flat=True)] + \
+               [edge.schedule_key(year) for year in years] + [edge.LISTINGS]
+
+    def request_profile_refresh(self) -> int:
+        """Queue these users' profiles for the next background refresh
+        """
+        return self.filter(profile_refresh_requested__isnull=True).update(profile_refresh_requested=timezone.now())
+
 
 class TwitterUser(models.Model):
 
-    id = models.PositiveIntegerField(primary_key=True, unique=True, verbose_name='Twitter ID')
+    id = models.PositiveBigIntegerField(primary_key=True, unique=True, verbose_name='Twitter ID')
 
     username = models.CharField(max_length=64, unique=True)
 
@@ -209,19 +417,35 @@ class TwitterUser(models.Model):
 
     profile_img = models.URLField()
 
+    profile_updated = models.DateTimeField(null=True, blank=True, help_text='When the profile was last fetched from Twitter')
+
+    profile_refresh_requested = models.DateTimeField(
+        null=True, blank=True, db_index=True, help_text='Set while the profile is queued for a background refresh'
+    )
+
     objects = TwitterUserQuerySet.as_manager()
 
     class Meta:
+        indexes = [
+            # Prefix search on the players and standings pages
+            models.Index(Upper('username'), name='twitteruser_username_upper_idx'),
+            models.Index(Upper('name'), name='twitteruser_name_upper_idx'),
+        ]
         verbose_name = 'Twitter User'
         verbose_name_plural = 'Twitter Users'
 
     def __str__(self) -> str:
         return f'@{self.username}'
+
+    @property
+    def profile_is_fresh(self) -> bool:
+        max_age = datetime.timedelta(seconds=settings.TWITTER_PROFILE_TTL)
+        return self.profile_updated is not None and self.profile_updated > timezone.now() - max_age
     
     @property
     def first_pick(self):
         if not getattr(self, '_first_pick', None):
-            self._first_pick = self.picks.order_by('race__date').first()
+            self._first_pick = self.picks.select_related('race__schedule').order_by('race__date').first()
         return self._first_pick
 
 
@@ -240,6 +464,10 @@ class RaceResult(models.Model):
             ('race', 'driver'),
             ('race', 'position'),
         ]
+        indexes = [
+            # Wins, podiums and top 10s all filter on position <= 10
+            models.Index(fields=['position', 'points'], name='result_top_10_idx', condition=models.Q(position__lte=10)),
+        ]
         default_related_name = 'results'
         ordering = ('race', 'position',)
         verbose_name = 'Race Result'
@@ -249,6 +477,17 @@ class RaceResult(models.Model):
         return f'{self.driver} @ {self.race}'
 
 
+class RacePickQuerySet(models.QuerySet):
+
+    def for_display(self):
+        """Join in, and only load, the columns that the pick tables render
+        """
+        return self.select_related('user', 'driver', 'result', 'race').only(
+            'tweet_id', 'user', 'user__username', 'driver', 'driver__default_number', 'driver__last_name',
+            'result', 'result__position', 'result__points', 'race', 'race__track',
+        )
+
+
 class RacePick(models.Model):
 
     user = models.ForeignKey(TwitterUser, on_delete=models.CASCADE)
@@ -261,13 +500,22 @@ class RacePick(models.Model):
 
     timestamp = CreationDateTimeField()
 
+    seed = models.BigIntegerField(null=True, blank=True, help_text='Seed the pick was drawn from, if drawn by the pick engine')
+
     result = models.ForeignKey(
         RaceResult, on_delete=models.CASCADE, null=True, blank=True,
         help_text='Is associated on result save'
     )
 
+    objects = RacePickQuerySet.as_manager()
+
     class Meta:
         unique_together = ['race', 'user']
+        indexes = [
+            # Linking picks to a new result, and a player's picks for a season
+            models.Index(fields=['race', 'driver'], name='pick_race_driver_idx'),
+            models.Index(fields=['user', 'race'], name='pick_user_race_idx'),
+        ]
         default_related_name = 'picks'
         ordering = ('timestamp',)
         verbose_name = 'Race Pick'
@@ -277,8 +525,427 @@ class RacePick(models.Model):
         return f"{self.user}'s pick for {self.race}"
 
 
+STANDING_FIELDS = ('points', 'starts', 'wins', 'podiums', 'top_10s', 'finish_sum', 'finish_count')
+
+
+class SeasonStandingQuerySet(models.QuerySet):
+
+    def live(self, schedule: Schedule, users=None):
+        """Aggregate the standings columns straight from picks and results, grouped by user
+        """
+        picks = RacePick.objects.filter(race__schedule=schedule)
+        if users is not None:
+            picks = picks.filter(user__in=users)
+        return picks.order_by().values('user').annotate(**self.aggregates())
+
+    @staticmethod
+    def aggregates() -> dict:
+        """The standings columns as aggregates over `RacePick` rows
+        """
+        return dict(
+            starts=models.Count('id'),
+            wins=models.Count('id', filter=models.Q(result__position=1)),
+            podiums=models.Count('id', filter=models.Q(result__position__lte=3)),
+            top_10s=models.Count('id', filter=models.Q(result__position__lte=10)),
+            finish_sum=Coalesce(models.Sum('result__position'), 0),
+            finish_count=models.Count('result'),
+            points=Coalesce(models.Sum('result__points'), 0),
+        )
+
+    def breakdown(self, user: TwitterUser):
+        """Career totals and per-season standings (newest first) for a user from one query grouped by
+        schedule. The user's first pick is resolved from the same rows.
+        """
+        season_picks = RacePick.objects.filter(user=user, race__schedule=models.OuterRef('race__schedule')) \
+                                       .order_by('race__date')
+        rows = RacePick.objects.filter(user=user).order_by() \
+                               .values('race__schedule', 'race__schedule__year', 'race__schedule__standings_version',
+                                       'race__schedule__results_version') \
+                               .annotate(
+                                   **self.aggregates(),
+                                   first_race_id=models.Subquery(season_picks.values('race_id')[:1]),
+                                   first_race_track=models.Subquery(season_picks.values('race__track')[:1]),
+                               ).order_by('-race__schedule__year')
+
+        seasons = []
+        for row in rows:
+            schedule = Schedule(
+                id=row.pop('race__schedule'), year=row.pop('race__schedule__year'),
+                standings_version=row.pop('race__schedule__standings_version'),
+                results_version=row.pop('race__schedule__results_version'),
+            )
+            first_race = Race(id=row.pop('first_race_id'), track=row.pop('first_race_track'), schedule=schedule)
+            user._first_pick = RacePick(user=user, race=first_race)
+            seasons.append(SeasonStanding(user=user, schedule=schedule, **row))
+
+        career = SeasonStanding(user=user, **{
+            field: sum(getattr(season, field) for season in seasons) for field in STANDING_FIELDS
+        })
+        return career, seasons
+
+    def rebuild(self, schedule: Schedule, users=None):
+        """Replace the standings rows for a schedule (optionally only for some users) with the live aggregate
+        """
+        with transaction.atomic():
+            existing = self.filter(schedule=schedule)
+            if users is not None:
+                existing = existing.filter(user__in=users)
+            existing = {standing.user_id: standing for standing in existing}
+
+            created, updated = [], []
+            for row in self.live(schedule, users=users):
+                user_id = row.pop('user')
+                standing = existing.pop(user_id, None) or SeasonStanding(schedule=schedule, user_id=user_id)
+                for field, value in row.items():
+                    setattr(standing, field, value)
+                (updated if standing.pk else created).append(standing)
+
+            self.filter(id__in=[standing.id for standing in existing.values()]).delete()
+            self.bulk_update(updated, fields=STANDING_FIELDS)
+            self.bulk_create(created)
+            CareerStanding.objects.rebuild(users=users)
+            Schedule.objects.standings_changed(schedule.id)
+            return updated + created
+
+    def record_start(self, pick: 'RacePick'):
+        """Count a newly created pick without re-aggregating the user's season
+        """
+        schedule_id = pick.race.schedule_id
+        updated = self.filter(user_id=pick.user_id, schedule_id=schedule_id) \
+                      .update(starts=models.F('starts') + 1)
+        if not updated:
+            self.create(user_id=pick.user_id, schedule_id=schedule_id, starts=1)
+            # A new entrant joins the table on no points, which moves nobody else's result. Bumped after
+            # commit so the schedule's row isn't locked for the rest of the submission.
+            transaction.on_commit(lambda: Schedule.objects.standings_changed(schedule_id, results=False))
+        CareerStanding.objects.record_start(pick)
+
+
+class SeasonStanding(models.Model):
+    """Materialized per-season totals for a user, kept up to date as picks and results are saved
+    """
+
+    user = models.ForeignKey(TwitterUser, on_delete=models.CASCADE)
+
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+
+    points = models.IntegerField(default=0)
+
+    starts = models.PositiveIntegerField(default=0)
+
+    wins = models.PositiveIntegerField(default=0)
+
+    podiums = models.PositiveIntegerField(default=0)
+
+    top_10s = models.PositiveIntegerField(default=0)
+
+    finish_sum = models.PositiveIntegerField(default=0, help_text='Sum of finishing positions of resulted picks')
+
+    finish_count = models.PositiveIntegerField(default=0, help_text='Number of resulted picks')
+
+    objects = SeasonStandingQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ['schedule', 'user']
+        indexes = [
+            models.Index(fields=['schedule', '-points', 'user'], name='standing_schedule_points_idx'),
+        ]
+        default_related_name = 'standings'
+        ordering = ('schedule', '-points', 'user')
+        verbose_name = 'Season Standing'
+        verbose_name_plural = 'Season Standings'
+
+    def __str__(self) -> str:
+        return f'{self.user} in {self.schedule}'
+
+    @property
+    def avg_finish(self) -> float:
+        return self.finish_sum / self.finish_count if self.finish_count else 0.0
+
+    @property
+    def year(self) -> int:
+        return self.schedule.year
+
+
+class CareerStandingQuerySet(models.QuerySet):
+
+    def rebuild(self, users=None):
+        """Replace the career rows (optionally only for some users) with the sum of their season standings
+        """
+        totals = SeasonStanding.objects.order_by().values('user').annotate(
+            **{field: models.Sum(field) for field in STANDING_FIELDS}
+        )
+        existing = self.all()
+        if users is not None:
+            totals = totals.filter(user__in=users)
+            existing = existing.filter(user__in=users)
+        existing = {career.user_id: career for career in existing}
+
+        with transaction.atomic():
+            created, updated = [], []
+            for row in totals:
+                user_id = row.pop('user')
+                career = existing.pop(user_id, None) or CareerStanding(user_id=user_id)
+                for field, value in row.items():
+                    setattr(career, field, value)
+                career.avg_finish = career.finish_sum / career.finish_count if career.finish_count else 0.0
+                (created if career._state.adding else updated).append(career)
+
+            self.filter(user__in=list(existing)).delete()
+            self.bulk_update(updated, fields=STANDING_FIELDS + ('avg_finish',))
+            self.bulk_create(created)
+            return updated + created
+
+    def record_start(self, pick: 'RacePick'):
+        updated = self.filter(user_id=pick.user_id).update(starts=models.F('starts') + 1)
+        if not updated:
+            self.create(user_id=pick.user_id, starts=1)
+
+
+class CareerStanding(models.Model):
+    """Materialized all-time totals for a user, the sum of their season standings
+
+    The players listing is ordered and paginated on these columns, so the average finish is stored too.
+    """
+
+    user = models.OneToOneField(TwitterUser, primary_key=True, on_delete=models.CASCADE, related_name='career')
+
+    points = models.IntegerField(default=0)
+
+    starts = models.PositiveIntegerField(default=0)
+
+    wins = models.PositiveIntegerField(default=0)
+
+    podiums = models.PositiveIntegerField(default=0)
+
+    top_10s = models.PositiveIntegerField(default=0)
+
+    finish_sum = models.PositiveIntegerField(default=0, help_text='Sum of finishing positions of resulted picks')
+
+    finish_count = models.PositiveIntegerField(default=0, help_text='Number of resulted picks')
+
+    avg_finish = models.FloatField(default=0.0)
+
+    objects = CareerStandingQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # One per players listing order, see `views.PLAYER_ORDERINGS`
+            models.Index(fields=['-starts', 'avg_finish', 'user'], name='career_starts_idx'),
+            models.Index(fields=['-points', 'user'], name='career_points_idx'),
+            models.Index(
+                fields=['avg_finish', 'user'], name='career_avg_finish_idx', condition=models.Q(finish_count__gt=0),
+            ),
+        ]
+        ordering = ('-starts', 'avg_finish', 'user')
+        verbose_name = 'Career Standing'
+        verbose_name_plural = 'Career Standings'
+
+    def __str__(self) -> str:
+        return f'{self.user} career'
+
+
+class StatsSnapshotManager(models.Manager):
+
+    # Length of the most common picks, most starts and most wins leaderboards
+    leaderboard_size = 25
+
+    def compute(self) -> dict:
+        """Every figure on the statistics page from a handful of grouped queries
+        """
+        totals = RacePick.objects.order_by().aggregate(
+            players=models.Count('user', distinct=True),
+            picks=models.Count('id'),
+            winning_picks=models.Count('id', filter=models.Q(result__position=1)),
+            average_finish=models.Avg('result__position'),
+        )
+        today = timezone.now().date()
+        races = Race.objects.order_by().aggregate(
+            past=models.Count('id', filter=models.Q(date__lt=today)),
+            upcoming=models.Count('id', filter=models.Q(date__gte=today)),
+        )
+        common_picks = list(
+            RaceDriver.objects.annotate(num_picks=models.Count('picks')) \
+                              .order_by('-num_picks', 'last_name') \
+                              .values('last_name', 'num_picks')[:self.leaderboard_size]
+        )
+        career = SeasonStanding.objects.order_by().values('user__username').annotate(
+            starts=models.Sum('starts'), num_wins=models.Sum('wins'),
+            podiums=models.Sum('podiums'), top_10s=models.Sum('top_10s'),
+        )
+        return {
+            'single_stats': [
+                ('Total Players', totals['players']),
+                ('Total Picks', totals['picks']),
+                ('Most Common Pick', common_picks[0]['last_name'] if common_picks else '-'),
+                ('Winning Picks', totals['winning_picks']),
+                # Viewable races are every past race plus the current one
+                ('Total Races', races['past'] + min(races['upcoming'], 1)),
+                ('Average Finish', totals['average_finish'] or 0),
+            ],
+            'common_picks': common_picks,
+            'starts': [
+                {'username': row['user__username'], 'starts': row['starts']}
+                for row in career.order_by('-starts', 'user__username')[:self.leaderboard_size]
+            ],
+            'most_wins': [
+                {'username': row['user__username'], 'num_wins': row['num_wins']}
+                for row in career.order_by('-num_wins', '-podiums', '-top_10s', 'user__username')[:self.leaderboard_size]
+            ],
+        }
+
+    def refresh(self) -> 'StatsSnapshot':
+        snapshot = self.create(data=self.compute())
+        # Only a short history is worth keeping around
+        self.filter(id__lt=snapshot.id - settings.STATS_SNAPSHOT_HISTORY).delete()
+        return snapshot
+
+    def current(self) -> 'StatsSnapshot':
+        """The latest snapshot, refreshed first if it is older than `STATS_SNAPSHOT_MAX_AGE` seconds
+        """
+        snapshot = self.order_by('-created').first()
+        max_age = datetime.timedelta(seconds=settings.STATS_SNAPSHOT_MAX_AGE)
+        if not snapshot or snapshot.created < timezone.now() - max_age:
+            snapshot = self.refresh()
+        return snapshot
+
+
+class StatsSnapshot(models.Model):
+    """Timestamped copy of everything on the statistics page
+    """
+
+    created = CreationDateTimeField(db_index=True)
+
+    data = models.JSONField()
+
+    objects = StatsSnapshotManager()
+
+    class Meta:
+        get_latest_by = 'created'
+        verbose_name = 'Statistics Snapshot'
+        verbose_name_plural = 'Statistics Snapshots'
+
+    def __str__(self) -> str:
+        return f'Statistics at {self.created}'
+
+
+class PageVersionManager(models.Manager):
+
+    def versions(self, keys) -> dict:
+        """Current version of each surrogate key, 0 for keys that have never been purged
+        """
+        keys = set(keys)
+        versions = dict(self.filter(key__in=keys).values_list('key', 'version'))
+        return {key: versions.get(key, 0) for key in keys}
+
+    def bump(self, keys):
+        """Move the versions of `keys` on, dropping the pages cached under them. One statement once every
+        key has been purged before.
+        """
+        keys = set(keys)
+        if self.filter(key__in=keys).update(version=models.F('version') + 1, changed=timezone.now()) < len(keys):
+            existing = set(self.filter(key__in=keys).values_list('key', flat=True))
+            # A concurrent first purge of the same key moves it off 0 just the same
+            self.bulk_create([PageVersion(key=key) for key in keys - existing], ignore_conflicts=True)
+
+
+class PageVersion(models.Model):
+    """Version of a surrogate key (see `edge.py`), which cached pages carrying it are checked against
+    """
+
+    key = models.CharField(max_length=64, unique=True)
+
+    # Pages are cached against 0 until the key's first purge
+    version = models.PositiveBigIntegerField(default=1)
+
+    changed = models.DateTimeField(default=timezone.now)
+
+    objects = PageVersionManager()
+
+    class Meta:
+        verbose_name = 'Page Version'
+        verbose_name_plural = 'Page Versions'
+
+    def __str__(self) -> str:
+        return f'{self.key} version {self.version}'
+
+
+@receiver(post_save, sender=RaceDriver)
+@receiver(post_delete, sender=RaceDriver)
+def clear_driver_roster(**kwargs):
+    RaceDriver.objects.clear_roster()
+
+
+@receiver(post_save, sender=Race)
+@receiver(post_delete, sender=Race)
+def clear_upcoming_races(**kwargs):
+    Race.objects.clear_upcoming()
+
+
 @receiver(post_save, sender=RaceResult)
 def update_race_pick_results(instance: RaceResult, **kwargs):
     """When a result is provided, update all associated picks to point at it
     """
-    RacePick.objects.filter(race=instance.race, driver=instance.driver).all().update(result=instance)
+    with transaction.atomic():
+        affected = RacePick.objects.filter(race=instance.race_id) \
+                                   .filter(models.Q(driver=instance.driver_id) | models.Q(result=instance))
+        users = list(affected.values_list('user_id', flat=True))
+        RacePick.objects.filter(race=instance.race, driver=instance.driver).all().update(result=instance)
+        SeasonStanding.objects.rebuild(instance.race.schedule, users=users)
+
+
+@receiver(post_save, sender=RacePick)
+def update_pick_standing(instance: RacePick, created: bool, **kwargs):
+    """New picks only add a start, anything else re-aggregates the user's season
+    """
+    if created:
+        SeasonStanding.objects.record_start(instance)
+    else:
+        SeasonStanding.objects.rebuild(instance.race.schedule, users=[instance.user_id])
+
+
+@receiver(post_delete, sender=RacePick)
+def remove_pick_standing(instance: RacePick, **kwargs):
+    SeasonStanding.objects.rebuild(instance.race.schedule, users=[instance.user_id])
+
+
+@receiver(post_save, sender=RacePick)
+@receiver(post_delete, sender=RacePick)
+def purge_pick_pages(instance: RacePick, **kwargs):
+    """Picks change their race, their player and the season's standings
+    """
+    edge.purge(
+        edge.race_key(instance.race_id), edge.user_key(instance.user_id),
+        edge.schedule_key(instance.race.date.year), edge.LISTINGS,
+    )
+
+
+@receiver(post_save, sender=RaceResult)
+@receiver(post_delete, sender=RaceResult)
+def purge_result_pages(instance: RaceResult, **kwargs):
+    """Results change the race's picks and its whole season's standings
+    """
+    edge.purge(edge.race_key(instance.race_id), edge.schedule_key(instance.race.date.year), edge.LISTINGS)
+
+
+@receiver(post_save, sender=TwitterUser)
+def purge_user_pages(instance: TwitterUser, created: bool, **kwargs):
+    if not created:
+        edge.purge(*TwitterUser.objects.filter(id=instance.id).page_keys())
+
+
+@receiver(edge.purged)
+def bump_page_versions(keys, **kwargs):
+    PageVersion.objects.bump(keys)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=Race)
+@receiver(post_delete, sender=Race)
+@receiver(post_save, sender=RaceDriver)
+@receiver(post_delete, sender=RaceDriver)
+def purge_all_pages(**kwargs):
+    """Races and drivers show up on nearly every page
+    """
+    edge.purge(edge.ALL_PAGES)
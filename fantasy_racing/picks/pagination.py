@@ -0,0 +1,89 @@
+"""Keyset (seek) pagination for the players and standings listings
+
+Rather than skipping an OFFSET, which the database still has to walk, each page asks for the rows after
+the last row of the previous page. With an index on the ordering that is a single seek, so page N costs the
+same as page 1. The cursor carries that last row's ordering values and its position in the listing. It is
+signed, so the positions shown on later pages are always ones the server handed out, and its values are
+checked against the type of the field they order by.
+"""
+from dataclasses import dataclass
+from operator import attrgetter
+from typing import List, Optional, Sequence, Type
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import BadRequest, ValidationError
+from django.db import models
+
+
+@dataclass
+class KeysetPage:
+    rows: List[models.Model]
+    # Position of the first row within the whole listing, counting from 1
+    start: int
+    next_cursor: Optional[str]
+
+
+CURSOR_SALT = 'fantasy_racing.picks.pagination'
+
+
+def encode_cursor(position: int, values: Sequence) -> str:
+    return signing.dumps([position, list(values)], salt=CURSOR_SALT)
+
+
+def coerce(model: Type[models.Model], field: str, value):
+    """A cursor value as the Python type of the field it orders by, rejecting nulls the seek can't compare
+    """
+    if value is None:
+        raise ValueError(field)
+    return model._meta.get_field(field.lstrip('-')).to_python(value)
+
+
+def decode_cursor(cursor: str, ordering: Sequence[str], model: Type[models.Model]) -> tuple:
+    try:
+        position, values = signing.loads(cursor, salt=CURSOR_SALT)
+        if not isinstance(position, int) or position < 0 or len(values) != len(ordering):
+            raise ValueError(cursor)
+        values = [coerce(model, field, value) for field, value in zip(ordering, values)]
+    except (signing.BadSignature, TypeError, ValueError, ValidationError) as e:
+        raise BadRequest(f'Invalid page cursor {cursor!r}') from e
+    return position, values
+
+
+def seek(ordering: Sequence[str], values: Sequence) -> models.Q:
+    """Rows that come after `values` in `ordering`, e.g. for ('-points', 'user_id'):
+    points <= p AND (points < p OR (points = p AND user_id > u))
+    """
+    after, equal = models.Q(), {}
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        after |= models.Q(**equal, **{f'{name}__{lookup}': value})
+        equal[name] = value
+    # The redundant bound on the leading field is what lets the index seek straight to the cursor
+    leading = ordering[0]
+    return models.Q(**{f'{leading.lstrip("-")}__{"lte" if leading.startswith("-") else "gte"}': values[0]}) & after
+
+
+def paginate(queryset: models.QuerySet, ordering: Sequence[str], cursor: str = None,
+             size: int = None) -> KeysetPage:
+    """One page of `queryset` in `ordering`, whose last field must be unique, after the row in `cursor`
+    """
+    size = size or settings.LISTING_PAGE_SIZE
+    start = 1
+    if cursor:
+        position, values = decode_cursor(cursor, ordering, queryset.model)
+        queryset = queryset.filter(seek(ordering, values))
+        start = position + 1
+
+    # One row past the page says whether there is a next one
+    rows = list(queryset.order_by(*ordering)[:size + 1])
+    next_cursor = None
+    if len(rows) > size:
+        rows = rows[:size]
+        key = attrgetter(*(field.lstrip('-') for field in ordering))
+        values = key(rows[-1]) if len(ordering) > 1 else (key(rows[-1]),)
+        next_cursor = encode_cursor(start + size - 1, values)
+    for position, row in enumerate(rows, start=start):
+        row.position = position
+    return KeysetPage(rows=rows, start=start, next_cursor=next_cursor)
@@ -0,0 +1,102 @@
+"""Background refresh of stored Twitter profiles
+
+Users are queued by setting `TwitterUser.profile_refresh_requested` (see `request_profile_refresh`) and the
+`refresh_profiles` command drains the queue in batches, looking each batch up with one call to the
+backend named by `PROFILE_REFRESH_BACKEND`. The queue doubles as the checkpoint: a user only leaves it
+once their batch is written back, so an interrupted run picks up where it stopped.
+"""
+import asyncio
+from typing import Dict, List, Sequence
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from fantasy_racing.utils import twitter
+
+from .models import TwitterUser
+
+
+# The most users Twitter's user lookup accepts in one call
+BATCH_SIZE = 100
+
+PROFILE_FIELDS = ('username', 'name', 'profile_img')
+
+
+class ProfileBackend:
+    """Looks up the current profiles of a batch of users by Twitter ID
+    """
+
+    # Epoch time before which the backend must not be called again, if it is being rate limited
+    resume_at = None
+
+    def lookup(self, user_ids: Sequence[int]) -> Dict[int, twitter.Profile]:
+        """Profiles keyed by ID. Users left out no longer exist and keep their stored profile.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TwitterProfileBackend(ProfileBackend):
+    """Twitter's user lookup with the app's bearer token, over one pooled session for the whole run
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self.session = None
+
+    def lookup(self, user_ids: Sequence[int]) -> Dict[int, twitter.Profile]:
+        return self.loop.run_until_complete(self._lookup(user_ids))
+
+    async def _lookup(self, user_ids: Sequence[int]) -> Dict[int, twitter.Profile]:
+        if self.session is None:
+            self.session = twitter.new_session()
+        client = twitter.TwitterClient(self.session)
+        try:
+            profiles = await client.lookup_users(user_ids)
+        finally:
+            exhausted = client.rate_limit_remaining == 0
+            self.resume_at = client.rate_limit_reset if exhausted else None
+        return {profile.id: profile for profile in profiles}
+
+    def close(self):
+        if self.session is not None:
+            self.loop.run_until_complete(self.session.close())
+        self.loop.close()
+
+
+class StubProfileBackend(ProfileBackend):
+    """Answers with the stored profiles, or the ones it is given, without any network access
+    """
+
+    def __init__(self, profiles: Dict[int, twitter.Profile] = None):
+        self.profiles = profiles or {}
+
+    def lookup(self, user_ids: Sequence[int]) -> Dict[int, twitter.Profile]:
+        stored = {
+            user.id: twitter.Profile(user.id, user.username, user.name, user.profile_img)
+            for user in TwitterUser.objects.filter(id__in=user_ids).exclude(id__in=self.profiles.keys())
+        }
+        return {**stored, **{user_id: self.profiles[user_id] for user_id in user_ids if user_id in self.profiles}}
+
+
+def get_backend() -> ProfileBackend:
+    return import_string(settings.PROFILE_REFRESH_BACKEND)()
+
+
+def apply_profiles(users: List[TwitterUser], profiles: Dict[int, twitter.Profile]) -> List[TwitterUser]:
+    """Copy looked up profiles onto the users and take them off the queue, returning the ones that changed
+    """
+    now, changed = timezone.now(), []
+    for user in users:
+        profile = profiles.get(user.id)
+        if profile is not None:
+            fetched = (profile.username, profile.name, profile.profile_image_url)
+            if fetched != tuple(getattr(user, field) for field in PROFILE_FIELDS):
+                user.username, user.name, user.profile_img = fetched
+                changed.append(user)
+            user.profile_updated = now
+        user.profile_refresh_requested = None
+    return changed
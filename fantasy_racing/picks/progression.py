@@ -0,0 +1,99 @@
+"""How a season's standings developed: every player's points and rank after each race with results
+
+The whole season is built in one streaming pass over its resulted picks, in no particular order. Points are
+summed into a races x players grid, then each race's totals are ranked like the standings table
+(points, then user ID). Players are only ranked once they've made their first pick.
+
+The result is kept in-process per schedule, like the driver roster, and rebuilt whenever the schedule's
+`results_version` moves (see `SeasonStandingQuerySet.rebuild`).
+"""
+from array import array
+from operator import add
+from typing import Dict, List, NamedTuple, Optional
+
+from .cache import per_season
+from .models import Race, RacePick, RaceResult, Schedule
+
+
+class Standing(NamedTuple):
+    points: int
+    rank: int
+
+
+class Progression:
+
+    def __init__(self, races: List[Race], user_ids: array, points: List[array], ranks: List[array]):
+        self.races = races
+        self.columns = {user_id: column for column, user_id in enumerate(user_ids)}
+        # One array per race, indexed by column. A rank of 0 means the player hadn't started yet.
+        self.points = points
+        self.ranks = ranks
+
+    def series(self, user_id: int) -> Dict[int, Standing]:
+        """A player's standing after every race they had started by, keyed by race ID
+        """
+        column = self.columns.get(user_id)
+        if column is None:
+            return {}
+        return {
+            race.id: Standing(self.points[idx][column], self.ranks[idx][column])
+            for idx, race in enumerate(self.races) if self.ranks[idx][column]
+        }
+
+    def movement(self, user_id: int) -> Optional[int]:
+        """Places gained (or lost, if negative) in the last race, None for players new to it
+        """
+        column = self.columns.get(user_id)
+        if column is None or len(self.races) < 2 or not self.ranks[-2][column]:
+            return None
+        return self.ranks[-2][column] - self.ranks[-1][column]
+
+
+def build(schedule: Schedule) -> Progression:
+    races = list(
+        Race.objects.filter(schedule=schedule, id__in=RaceResult.objects.values('race')).order_by('date', 'id')
+                    .only('id', 'track', 'date')
+    )
+    race_index = {race.id: idx for idx, race in enumerate(races)}
+
+    # Points each player scored in each race, one array per race indexed by the player's column
+    columns: Dict[int, int] = {}
+    user_ids, started = array('q'), array('i')
+    gained = [array('i') for _ in races]
+    picks = RacePick.objects.filter(race__in=list(race_index)).order_by() \
+                            .values_list('user_id', 'race_id', 'result__points').iterator(chunk_size=10000)
+    for user_id, race_id, points in picks:
+        idx = race_index[race_id]
+        column = columns.get(user_id)
+        if column is None:
+            column = columns[user_id] = len(user_ids)
+            user_ids.append(user_id)
+            started.append(idx)
+            for race_gained in gained:
+                race_gained.append(0)
+        elif idx < started[column]:
+            started[column] = idx
+        gained[idx][column] += points or 0
+
+    # Ties are broken by user ID like the standings table. Folding both into one integer sorts far quicker
+    # than tuples would: fewer points sort later, then higher IDs.
+    span = max(user_ids, default=0) + 1
+    totals = array('i', [0]) * len(user_ids)
+    points_after, ranks_after = [], []
+    for idx, race_gained in enumerate(gained):
+        totals = array('i', map(add, totals, race_gained))
+        keys = [-points * span + user_id for points, user_id in zip(totals, user_ids)]
+        ranks = array('i', [0]) * len(user_ids)
+        joined = (column for column, first in enumerate(started) if first <= idx)
+        for rank, column in enumerate(sorted(joined, key=keys.__getitem__), start=1):
+            ranks[column] = rank
+        points_after.append(totals)
+        ranks_after.append(ranks)
+    return Progression(races, user_ids, points_after, ranks_after)
+
+
+@per_season('results_version')
+def for_schedule(schedule: Schedule) -> Progression:
+    """The season's progression, rebuilt only once its standings have been rebuilt
+    """
+    return build(schedule)
@@ -0,0 +1,40 @@
+"""Championship positions of single players, without ranking the whole season for every page
+
+A season's standings are read once, already in table order (points, then user ID) from the standings
+index, into a sorted list of integer keys. A player's position is then a binary search for their own key.
+The list is kept in-process per schedule and rebuilt whenever the schedule's `standings_version` moves.
+"""
+from bisect import bisect_left
+from typing import List, Optional
+
+from .cache import per_season
+from .models import Schedule, SeasonStanding
+
+
+def sort_key(points: int, user_id: int) -> int:
+    # Sorts like ('-points', 'user_id'): Twitter IDs fit in 64 bits, so they never spill into the points
+    return (-points << 64) + user_id
+
+
+class RankIndex:
+
+    def __init__(self, keys: List[int]):
+        self.keys = keys
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def position(self, points: int, user_id: int) -> Optional[int]:
+        """A player's position in the standings table, None if they aren't in it
+        """
+        key = sort_key(points, user_id)
+        idx = bisect_left(self.keys, key)
+        if idx == len(self.keys) or self.keys[idx] != key:
+            return None
+        return idx + 1
+
+
+@per_season('standings_version')
+def for_schedule(schedule: Schedule) -> RankIndex:
+    standings = SeasonStanding.objects.filter(schedule=schedule, starts__gt=0).order_by('-points', 'user_id')
+    return RankIndex([sort_key(points, user_id) for points, user_id in standings.values_list('points', 'user_id')])
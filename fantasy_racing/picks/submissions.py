@@ -0,0 +1,104 @@
+"""The write path behind the pick view
+
+A submission makes sure the player exists, draws and stores their pick and counts the start in their
+standing, all in one transaction. Both rows are written with the backend's insert-or-ignore
+(`ON CONFLICT DO NOTHING` / `INSERT OR IGNORE`), so concurrent duplicate submissions for the same race and
+player never fail on the unique constraint: the losers simply read back the winner's pick. The player's
+insert can also be ignored because a stale player still holds a username Twitter has since recycled, in
+which case the stale player is renamed and queued for a profile refresh, and the insert is retried.
+
+Those inserts skip model signals, so the standing and purge are made here instead. The CDN is left alone:
+picks only go in for the current race, whose pages it keeps briefly.
+"""
+import logging
+from typing import Tuple
+
+from asgiref.sync import sync_to_async
+from django.db import connections, models, router, transaction
+from django.db.models import sql
+from django.utils import timezone
+
+from fantasy_racing.utils import twitter
+
+from . import edge, engine
+from .models import Race, RaceDriver, RacePick, SeasonStanding, TwitterUser
+
+
+logger = logging.getLogger(__name__)
+
+# Picks aren't tweeted individually yet, they all point at the announcement tweet
+ANNOUNCEMENT_TWEET_ID = '1490491780520943620'
+
+
+def insert_ignore(obj: models.Model) -> bool:
+    """Insert a row unless it conflicts with an existing one, returning whether it was inserted
+    """
+    model = type(obj)
+    opts = model._meta
+    using = router.db_for_write(model)
+    query = sql.InsertQuery(model, ignore_conflicts=True)
+    query.insert_values([field for field in opts.concrete_fields if field is not opts.auto_field], [obj])
+    with connections[using].cursor() as cursor:
+        for statement, params in query.get_compiler(using=using).as_sql():
+            cursor.execute(statement, params)
+        return cursor.rowcount > 0
+
+
+def release_username(user_id: int, username: str) -> bool:
+    """Rename whoever else still holds `username`, which Twitter has since given to `user_id`, returning
+    whether anyone did. They keep a placeholder no Twitter handle can clash with until their profile is refreshed.
+    """
+    stale = TwitterUser.objects.filter(username=username).exclude(id=user_id).first()
+    if stale is None:
+        return False
+    logger.info('@%s now belongs to %s, renaming %s until their profile is refreshed', username, user_id, stale.id)
+    TwitterUser.objects.filter(id=stale.id).update(username=f'~{stale.id}', profile_refresh_requested=timezone.now())
+    edge.purge(*TwitterUser.objects.filter(id=stale.id).page_keys())
+    return True
+
+
+async def get_profile(client: twitter.TwitterClient, access_token: dict) -> twitter.Profile:
+    """The signed in player's profile, from Twitter only the first time we see them
+
+    Stored profiles are used as they are. Once older than `TWITTER_PROFILE_TTL`, or when the access token
+    shows a new username, they are queued for a background refresh rather than fetched while the player waits.
+    """
+    user_id = int(access_token['user_id'])
+    user = await sync_to_async(TwitterUser.objects.filter(id=user_id).first)()
+    if user is None:
+        return await client.get_me(access_token['oauth_token'], access_token['oauth_token_secret'])
+
+    if not user.profile_is_fresh or user.username != access_token.get('screen_name', user.username):
+        await sync_to_async(TwitterUser.objects.filter(id=user_id).request_profile_refresh)()
+    return twitter.Profile(id=user.id, username=user.username, name=user.name, profile_image_url=user.profile_img)
+
+
+def submit_pick(race: Race, user_id: int, username: str, name: str, profile_img: str) -> Tuple[RacePick, bool]:
+    """Draw and store a player's pick for a race, returning the pick and whether it was just made
+    """
+    seed = engine.pick_seed(race.id, user_id)
+    # Outside the transaction, so a roster stored by this draw stays stored whatever happens to the pick
+    roster = RaceDriver.objects.race_roster(race)
+    with transaction.atomic():
+        user = TwitterUser(
+            id=user_id, username=username, name=name, profile_img=profile_img, profile_updated=timezone.now(),
+        )
+        joined = insert_ignore(user)
+        created = insert_ignore(RacePick(
+            user_id=user_id, race_id=race.id, driver=engine.draw(seed, roster), seed=seed,
+            tweet_id=ANNOUNCEMENT_TWEET_ID,
+        ))
+        # Foreign keys are checked at commit, so a new pick may be missing its player if the username was taken
+        if created and not joined and release_username(user_id, username):
+            joined = insert_ignore(user)
+        if joined:
+            logger.info('%s just joined for the first time!', user)
+        pick = RacePick.objects.select_related('user', 'driver').get(race=race, user_id=user_id)
+        pick.race = race
+        if created:
+            SeasonStanding.objects.record_start(pick)
+            edge.purge(
+                edge.race_key(race.id), edge.user_key(user_id), edge.schedule_key(race.date.year), edge.LISTINGS,
+                cdn=False,
+            )
+    return pick, created
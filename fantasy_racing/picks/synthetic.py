@@ -0,0 +1,106 @@
+"""Synthetic seasons for benchmarks and load tests
+
+Everything is inserted with `bulk_create`, so none of the model signals fire. Callers are expected to
+rebuild whatever is derived from picks and results afterwards, which `generate` does for the standings.
+"""
+import datetime
+import random
+from typing import Dict, List
+
+from django.db import models
+from django.utils import timezone
+
+from . import engine
+from .models import Race, RaceDriver, RacePick, RaceResult, RaceTeam, Schedule, SeasonStanding, TwitterUser
+
+
+POINTS = (25, 18, 15, 12, 10, 8, 6, 4, 2, 1)
+
+BATCH_SIZE = 5000
+
+
+def ensure_grid(num_drivers: int = 20) -> List[RaceDriver]:
+    """Make sure there are at least `num_drivers` active drivers, creating synthetic ones if needed
+    """
+    missing = num_drivers - RaceDriver.objects.filter(is_active=True).count()
+    if missing > 0:
+        team, _ = RaceTeam.objects.get_or_create(name='Synthetic Racing')
+        RaceDriver.objects.bulk_create([
+            RaceDriver(first_name='Synthetic', last_name=f'Driver {idx}', default_number=100 + idx, default_team=team)
+            for idx in range(missing)
+        ])
+    RaceDriver.objects.clear_roster()
+    return RaceDriver.objects.active_roster()
+
+
+def create_users(count: int) -> List[int]:
+    first_id = (TwitterUser.objects.aggregate(last=models.Max('id'))['last'] or 0) + 1
+    ids = list(range(first_id, first_id + count))
+    TwitterUser.objects.bulk_create([
+        TwitterUser(id=user_id, username=f'synthetic{user_id}', name=f'Synthetic {user_id}',
+                    profile_img='https://example.com/profile.png')
+        for user_id in ids
+    ], batch_size=BATCH_SIZE)
+    return ids
+
+
+def race_dates(year: int, num_races: int) -> List[datetime.date]:
+    """Weekly from March like a real season, closer together if that would run into the next year
+    """
+    first, last = datetime.date(year, 3, 1), datetime.date(year, 12, 31)
+    days_apart = min(7, (last - first).days // max(num_races - 1, 1))
+    return [first + datetime.timedelta(days=days_apart * idx) for idx in range(num_races)]
+
+
+def create_season(year: int, num_races: int, roster: List[RaceDriver]) -> List[Race]:
+    schedule = Schedule.objects.create(year=year)
+    Race.objects.bulk_create([
+        Race(schedule=schedule, track=f'Synthetic {idx + 1}', date=date, submit_by=timezone.now(),
+             roster=[driver.id for driver in roster])
+        for idx, date in enumerate(race_dates(year, num_races))
+    ])
+    return list(schedule.races.all())
+
+
+def create_results(race: Race, roster: List[RaceDriver], rng: random.Random) -> Dict[int, int]:
+    """Random finishing order for the whole roster, returning result IDs keyed by driver ID
+    """
+    finishing_order = rng.sample(roster, len(roster))
+    RaceResult.objects.bulk_create([
+        RaceResult(race=race, driver=driver, position=position,
+                   points=POINTS[position - 1] if position <= len(POINTS) else 0)
+        for position, driver in enumerate(finishing_order, start=1)
+    ])
+    return dict(race.results.values_list('driver_id', 'id'))
+
+
+def generate(users: int = 1000, seasons: int = 1, races: int = 22, drivers: int = 20,
+             participation: float = 1.0, with_results: bool = True, seed: int = 0) -> dict:
+    """Create `users` players and `seasons` seasons of `races` races, every player picking in each race
+    with probability `participation`. Finished races get results, and picks are linked to them.
+    """
+    rng = random.Random(seed)
+    roster = ensure_grid(drivers)
+    user_ids = create_users(users)
+
+    # Seasons end with the current one, or just before any existing ones, so they are never in the future
+    earliest = Schedule.objects.aggregate(first=models.Min('year'))['first']
+    last_year = earliest - 1 if earliest is not None else timezone.now().year
+    today = timezone.now().date()
+    counts = {'users': len(user_ids), 'races': 0, 'picks': 0, 'results': 0}
+    for year in range(last_year - seasons + 1, last_year + 1):
+        season_races = create_season(year, races, roster)
+        for race in season_races:
+            results = create_results(race, roster, rng) if with_results and race.date <= today else {}
+            participants = [user_id for user_id in user_ids if participation >= 1 or rng.random() < participation]
+            RacePick.objects.bulk_create([
+                # Plain IDs rather than instances keep model construction cheap at this volume
+                RacePick(user_id=user_id, race_id=race.id, driver_id=driver.id, seed=pick_seed, tweet_id='0',
+                         result_id=results.get(driver.id))
+                for user_id, pick_seed, driver in engine.draw_many(race.id, participants, roster=roster)
+            ], batch_size=BATCH_SIZE)
+            counts['races'] += 1
+            counts['picks'] += len(participants)
+            counts['results'] += len(results)
+        SeasonStanding.objects.rebuild(season_races[0].schedule)
+    return counts
@@ -1,3 +1,1282 @@
-from django.test import TestCase
+import asyncio
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import datetime
+import io
+import json
+import os
+import tempfile
+import time
+from unittest import mock
+from urllib.parse import urlsplit
 
-# Create your tests here.
+import aiohttp
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import requests
+
+from fantasy_racing.utils import twitter
+from fantasy_racing.utils.fake_twitter import FakeTwitter, FakeTwitterServer
+
+from . import edge, engine, metrics, pagination, profiles, progression, ranks, submissions, urls, views
+from .management.commands import refresh_profiles
+from .models import CareerStanding, FAQ, PageVersion, Race, RaceDriver, RacePick, RaceResult, RaceTeam, Schedule, SeasonStanding, StatsSnapshot, TwitterUser
+
+
+class FantasyTestCase(TestCase):
+    """Builds a small season: one team, a grid of drivers, a handful of races and users
+    """
+
+    num_drivers = 4
+    num_races = 3
+    num_users = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        team = RaceTeam.objects.create(name='Williams')
+        cls.drivers = [
+            RaceDriver.objects.create(first_name='Driver', last_name=f'{idx}', default_number=idx, default_team=team)
+            for idx in range(1, cls.num_drivers + 1)
+        ]
+        cls.schedule, cls.races = cls.create_season(timezone.now().year, cls.num_races)
+        cls.users = [
+            TwitterUser.objects.create(id=idx, username=f'user{idx}', name=f'User {idx}', profile_img='https://a.b/c.png')
+            for idx in range(1, cls.num_users + 1)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        RaceDriver.objects.clear_roster()
+        Race.objects.clear_upcoming()
+
+    @classmethod
+    def create_season(cls, year: int, num_races: int, first_date: datetime.date = None):
+        schedule = Schedule.objects.create(year=year)
+        first_date = first_date or timezone.now().date() - datetime.timedelta(weeks=num_races - 1)
+        races = [
+            Race.objects.create(
+                schedule=schedule, track=f'Track {idx}', date=first_date + datetime.timedelta(weeks=idx),
+                submit_by=timezone.now(),
+            )
+            for idx in range(num_races)
+        ]
+        return schedule, races
+
+    @staticmethod
+    def pick(user, race, driver):
+        return RacePick.objects.create(user=user, race=race, driver=driver, tweet_id='1')
+
+    @staticmethod
+    def result(race, driver, position, points):
+        return RaceResult.objects.create(race=race, driver=driver, position=position, points=points)
+
+
+class QueryBudgetMixin:
+    """Fails a test when a URL takes more queries than its declared budget
+    """
+
+    def assertQueryBudget(self, url: str, budget: int, status_code: int = 200):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code, url)
+        queries = '\n'.join(query['sql'] for query in context.captured_queries)
+        self.assertLessEqual(
+            len(context), budget, f'{url} ran {len(context)} queries, its budget is {budget}:\n{queries}'
+        )
+        return response
+
+
+class PublicViewQueryBudgetTests(QueryBudgetMixin, FantasyTestCase):
+    """Every public page must stay within a fixed number of queries no matter how much data there is
+    """
+
+    num_users = 30
+
+    # URL name -> (kwargs, budget). `play` and `pick` talk to Twitter and are covered elsewhere. Cached pages
+    # include reading the versions of their surrogate keys.
+    budgets = {
+        'about': ({}, 1),
+        'schedule': ({}, 4),
+        'schedule_year': (lambda test: {'year': test.schedule.year}, 4),
+        # Includes filling the in-process upcoming races, to tell whether the season is over, and building the
+        # season's progression for the movement column
+        'standings': ({}, 8),
+        'standing_year': (lambda test: {'year': test.schedule.year}, 8),
+        'race': ({}, 3),
+        'race_id': (lambda test: {'id': test.races[0].id}, 3),
+        # Plus building the rank index of every season the player played, or the progression of this one
+        'player': (lambda test: {'username': test.users[0].username}, 4),
+        'player_season': (lambda test: {'username': test.users[0].username, 'year': test.schedule.year}, 7),
+        'players': ({}, 2),
+        'statistics': ({}, 9),  # Includes building the first snapshot
+        'index': ({}, 1),
+        # Each API view also reads the data version for its validators
+        'api_schedule': (lambda test: {'year': test.schedule.year}, 3),
+        'api_race_picks': (lambda test: {'id': test.races[0].id}, 4),
+        'api_standings': (lambda test: {'year': test.schedule.year}, 3),
+        'api_players': ({}, 2),
+        'api_player': (lambda test: {'username': test.users[0].username}, 4),
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        _, past_races = cls.create_season(2000, 5, first_date=datetime.date(2000, 3, 1))
+        for race in past_races + cls.races:
+            for position, driver in enumerate(cls.drivers, start=1):
+                cls.result(race, driver, position=position, points=max(0, 10 - position))
+            for idx, user in enumerate(cls.users):
+                cls.pick(user, race, cls.drivers[idx % len(cls.drivers)])
+
+    def test_every_public_view_has_a_budget(self):
+        names = {pattern.name for pattern in urls.urlpatterns} - {'play', 'pick'}
+        self.assertEqual(names, set(self.budgets))
+
+    def test_public_views_within_budget(self):
+        for name, (kwargs, budget) in self.budgets.items():
+            with self.subTest(name):
+                kwargs = kwargs(self) if callable(kwargs) else kwargs
+                self.assertQueryBudget(reverse(name, kwargs=kwargs), budget)
+
+
+class AdminChangelistQueryBudgetTests(QueryBudgetMixin, FantasyTestCase):
+    """Admin changelists must not run queries per row, including the session and user lookups
+    """
+
+    num_users = 30
+
+    # Model -> budget: the session, the user, two counts and the page, plus one query per related list filter
+    budgets = {
+        FAQ: 5,
+        Schedule: 5,
+        RaceTeam: 5,
+        RaceDriver: 5,
+        Race: 8,  # Includes the date hierarchy
+        RacePick: 7,
+        RaceResult: 8,
+        TwitterUser: 5,
+        SeasonStanding: 6,
+        CareerStanding: 5,
+        StatsSnapshot: 5,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for race in cls.races:
+            for position, driver in enumerate(cls.drivers, start=1):
+                cls.result(race, driver, position=position, points=max(0, 10 - position))
+            for idx, user in enumerate(cls.users):
+                cls.pick(user, race, cls.drivers[idx % len(cls.drivers)])
+        cls.admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def test_every_registered_model_has_a_budget(self):
+        registered = {model for model in admin.site._registry if model._meta.app_label == 'picks'}
+        self.assertEqual(registered, set(self.budgets))
+
+    def test_changelists_within_budget(self):
+        for model, budget in self.budgets.items():
+            with self.subTest(model._meta.label):
+                self.assertQueryBudget(reverse(f'admin:picks_{model._meta.model_name}_changelist'), budget)
+
+    def test_race_state_annotations_match_properties(self):
+        races = Race.objects.with_state().order_by('date')
+        for annotated, race in zip(races, Race.objects.order_by('date')):
+            self.assertEqual((annotated._is_viewable, annotated._is_current), (race.is_viewable, race.is_current))
+
+
+@override_settings(LISTING_PAGE_SIZE=4)
+class ListingPaginationTests(FantasyTestCase):
+
+    num_users = 15
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for race in cls.races:
+            # Everyone but the last user plays, with plenty of ties on points
+            for idx, user in enumerate(cls.users[:-1]):
+                cls.pick(user, race, cls.drivers[idx % len(cls.drivers)])
+            for position, driver in enumerate(cls.drivers, start=1):
+                cls.result(race, driver, position=position, points=max(0, 10 - position))
+
+    def walk(self, url: str) -> tuple:
+        """Every row of a listing, following the next page links, and the queries each page took
+        """
+        rows, queries = [], []
+        while url:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            queries.append(len(context))
+            rows.extend(response.context['standings' if 'standings' in response.context else 'careers'])
+            url = response.context['next_url']
+        return rows, queries
+
+    def test_standings_pages_cover_the_season_in_order(self):
+        # Warm the in-process upcoming races and progression, as any running worker has
+        Race.objects.upcoming()
+        self.schedule.refresh_from_db()
+        progression.for_schedule(self.schedule)
+        rows, queries = self.walk(reverse('standing_year', kwargs={'year': self.schedule.year}))
+
+        expected = SeasonStanding.objects.filter(schedule=self.schedule, starts__gt=0).order_by('-points', 'user_id')
+        self.assertEqual([row.user_id for row in rows], [standing.user_id for standing in expected])
+        self.assertEqual([row.position for row in rows], list(range(1, len(rows) + 1)))
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(len(set(queries)), 1, queries)
+
+    def test_players_pages_in_every_ordering(self):
+        for sort, ordering in views.PLAYER_ORDERINGS.items():
+            with self.subTest(sort):
+                rows, queries = self.walk(f'{reverse("players")}?sort={sort}')
+                expected = CareerStanding.objects.filter(starts__gt=0).order_by(*ordering)
+                if sort == 'avg_finish':
+                    expected = expected.filter(finish_count__gt=0)
+                self.assertEqual([row.user_id for row in rows], [career.user_id for career in expected])
+                self.assertEqual(len(set(queries)), 1, queries)
+
+    def test_careers_sum_seasons(self):
+        self.create_season(2000, 1, first_date=datetime.date(2000, 3, 1))[1][0].picks.create(
+            user=self.users[0], driver=self.drivers[0], tweet_id='1',
+        )
+        live = {user.id: user for user in TwitterUser.objects.details()}
+        careers = CareerStanding.objects.all()
+        self.assertEqual(len(careers), self.num_users - 1)
+        for career in careers:
+            user = live[career.user_id]
+            self.assertEqual(
+                (career.points, career.starts, career.wins, career.podiums, career.top_10s),
+                (user.points, user.starts, user.wins, user.podiums, user.top_10s),
+            )
+            self.assertAlmostEqual(career.avg_finish, user.avg_finish)
+
+    def test_search_by_prefix(self):
+        TwitterUser.objects.filter(id=2).update(name='Speedy')
+        rows, _ = self.walk(f'{reverse("players")}?q=@USER1')
+        self.assertEqual([career.user_id for career in rows], [1, 13, 10, 14, 11, 12])
+
+        response = self.client.get(f'{reverse("standings")}?q=spee')
+        self.assertEqual([standing.user_id for standing in response.context['standings']], [2])
+
+    def test_search_folds_case_as_the_database_does(self):
+        TwitterUser.objects.filter(id=2).update(name='Zoë 100%')
+        self.assertEqual(list(TwitterUser.objects.search('zoë').values_list('id', flat=True)), [2])
+        self.assertEqual(list(TwitterUser.objects.search('zoë 1%').values_list('id', flat=True)), [])
+
+    def test_invalid_cursor(self):
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get(f'{reverse("players")}?after=nonsense')
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursors_are_signed_and_typed(self):
+        url = reverse('standing_year', kwargs={'year': self.schedule.year})
+        cursor = self.client.get(url).context['next_url'].split('after=')[1]
+        self.assertEqual(self.client.get(f'{url}?after={cursor}').status_code, 200)
+
+        # A client can neither move the positions shown nor seek with values of the wrong type
+        forged = base64.urlsafe_b64encode(json.dumps([1000, [-10, 1]]).encode()).decode()
+        for cursor in (forged, pagination.encode_cursor(4, ['many', 1]), pagination.encode_cursor(4, [None, 1])):
+            with self.subTest(cursor), self.assertLogs('django.request', 'WARNING'):
+                self.assertEqual(self.client.get(f'{url}?after={cursor}').status_code, 400)
+
+
+class ApiTests(FantasyTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        for idx, user in enumerate(cls.users):
+            cls.pick(user, cls.races[0], cls.drivers[idx])
+        cls.result(cls.races[0], cls.drivers[1], position=1, points=25)
+
+    def get_json(self, name: str, **kwargs):
+        response = self.client.get(reverse(name, kwargs=kwargs))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, json.loads(content)
+
+    def test_standings(self):
+        _, data = self.get_json('api_standings', year=self.schedule.year)
+        self.assertEqual(data['year'], self.schedule.year)
+        self.assertEqual(
+            [(row['position'], row['username'], row['points']) for row in data['standings']],
+            [(1, 'user2', 25), (2, 'user1', 0), (3, 'user3', 0)],
+        )
+
+    def test_race_picks_and_schedule(self):
+        _, data = self.get_json('api_race_picks', id=self.races[0].id)
+        self.assertEqual(data['race']['year'], self.schedule.year)
+        self.assertEqual(
+            [(pick['username'], pick['driver_number'], pick['position']) for pick in data['picks']],
+            [('user1', 1, None), ('user2', 2, 1), ('user3', 3, None)],
+        )
+        _, data = self.get_json('api_schedule', year=self.schedule.year)
+        self.assertEqual([race['id'] for race in data['races']], [race.id for race in self.races])
+
+    def test_players(self):
+        _, data = self.get_json('api_players')
+        self.assertEqual(len(data['players']), 3)
+        _, data = self.get_json('api_player', username='user2')
+        self.assertEqual((data['career']['points'], data['seasons'][0]['year']), (25, self.schedule.year))
+
+        with self.assertLogs('django.request', 'WARNING'):
+            response = self.client.get(reverse('api_player', kwargs={'username': 'nobody'}))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_only_reads_the_data_versions(self):
+        url = reverse('api_standings', kwargs={'year': self.schedule.year})
+        response, _ = self.get_json('api_standings', year=self.schedule.year)
+
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+
+        # Validators come from the database, so every worker agrees whatever their local cache holds
+        cache.clear()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # Writes to other seasons and players leave the season's validators alone
+        PageVersion.objects.bump([edge.schedule_key(self.schedule.year + 1), edge.user_key(self.users[0].id)])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        # A write made by another process, e.g. a management command
+        PageVersion.objects.bump([edge.schedule_key(self.schedule.year)])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.result(self.races[0], self.drivers[0], position=2, points=18)
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], response['ETag'])
+
+
+@override_settings(CDN_PURGE_BACKEND='fantasy_racing.picks.edge.LocalPurgeBackend')
+class EdgeCacheTests(FantasyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        edge.LocalPurgeBackend.purged.clear()
+
+    def test_races_of_finished_seasons_are_kept_at_the_edge(self):
+        _, old_races = self.create_season(2000, 2, first_date=datetime.date(2000, 3, 1))
+        past = self.client.get(reverse('race_id', kwargs={'id': old_races[0].id}))
+        self.assertIn(f's-maxage={settings.CDN_FINAL_MAX_AGE}', past['Cache-Control'])
+        self.assertIn(f'max-age={settings.CDN_LIVE_MAX_AGE}', past['Cache-Control'])
+        self.assertEqual(past['Surrogate-Key'], f'pages race-{old_races[0].id} schedule-2000')
+
+        # The navigation of a season in progress gains a race when the current one moves on
+        for url in (reverse('race'), reverse('race_id', kwargs={'id': self.races[0].id})):
+            with self.subTest(url):
+                self.assertIn(f's-maxage={settings.CDN_LIVE_MAX_AGE}', self.client.get(url)['Cache-Control'])
+
+        # Served from the page cache with the same headers
+        self.assertEqual(self.client.get(reverse('race_id', kwargs={'id': old_races[0].id}))['Surrogate-Key'],
+                         past['Surrogate-Key'])
+
+    def test_seasons_in_progress_are_live(self):
+        _, old_races = self.create_season(2000, 2, first_date=datetime.date(2000, 3, 1))
+        for name in ('standing_year', 'schedule_year', 'api_standings'):
+            with self.subTest(name):
+                live = self.client.get(reverse(name, kwargs={'year': self.schedule.year}))
+                self.assertIn(f's-maxage={settings.CDN_LIVE_MAX_AGE}', live['Cache-Control'])
+                finished = self.client.get(reverse(name, kwargs={'year': 2000}))
+                self.assertIn(f's-maxage={settings.CDN_FINAL_MAX_AGE}', finished['Cache-Control'])
+                self.assertIn('schedule-2000', finished['Surrogate-Key'])
+
+    def test_writes_purge_what_they_change(self):
+        user, race = self.users[0], self.races[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            pick = self.pick(user, race, self.drivers[0])
+        self.assertEqual(
+            edge.LocalPurgeBackend.purged,
+            ['listings', f'race-{race.id}', f'schedule-{self.schedule.year}', f'user-{user.id}']
+        )
+
+        edge.LocalPurgeBackend.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.result(race, pick.driver, position=1, points=25)
+        self.assertEqual(
+            edge.LocalPurgeBackend.purged, ['listings', f'race-{race.id}', f'schedule-{self.schedule.year}']
+        )
+
+        edge.LocalPurgeBackend.purged.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.username = 'renamed'
+            user.save()
+        self.assertEqual(
+            edge.LocalPurgeBackend.purged, ['listings', f'schedule-{self.schedule.year}', f'user-{user.id}']
+        )
+
+    def test_purges_wait_for_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.races[0].save()
+        self.assertEqual(edge.LocalPurgeBackend.purged, [])
+        callbacks[0]()
+        self.assertEqual(edge.LocalPurgeBackend.purged, ['pages'])
+
+    @override_settings(CDN_SERVICE_ID='service', CDN_API_TOKEN='token')
+    def test_fastly_backend_batches_keys(self):
+        keys = [f'user-{idx}' for idx in range(300)]
+        with mock.patch('requests.post') as post:
+            edge.FastlyPurgeBackend().purge(keys)
+        self.assertEqual(post.call_count, 2)
+        url, = post.call_args_list[0].args
+        self.assertEqual(url, 'https://api.fastly.com/service/service/purge')
+        headers = post.call_args_list[1].kwargs['headers']
+        self.assertEqual((headers['Fastly-Key'], headers['Surrogate-Key']), ('token', ' '.join(keys[256:])))
+
+
+class PlayerPageTests(FantasyTestCase):
+
+    def test_breakdown_matches_details(self):
+        user = self.users[0]
+        past_schedule, past_races = self.create_season(2000, 2, first_date=datetime.date(2000, 3, 1))
+        for race in past_races + self.races[:2]:
+            self.pick(user, race, self.drivers[0])
+        self.result(past_races[0], self.drivers[0], position=2, points=18)
+        self.result(self.races[0], self.drivers[0], position=5, points=10)
+
+        career, seasons = SeasonStanding.objects.breakdown(user)
+        self.assertEqual([season.year for season in seasons], [self.schedule.year, 2000])
+        for stats, schedule in [(career, None), (seasons[0], self.schedule), (seasons[1], past_schedule)]:
+            expected = TwitterUser.objects.filter(id=user.id).details(schedule=schedule).get()
+            for field in ('points', 'starts', 'wins', 'podiums', 'top_10s', 'avg_finish'):
+                self.assertEqual(getattr(stats, field), getattr(expected, field), field)
+        self.assertEqual(user.first_pick.race_id, past_races[0].id)
+
+
+class PageCacheTests(FantasyTestCase):
+
+    def test_pages_cached_until_a_write(self):
+        url = reverse('race_id', kwargs={'id': self.races[0].id})
+        self.client.get(url)
+        # Only the versions of the page's keys are read
+        with self.assertNumQueries(1):
+            self.assertNotContains(self.client.get(url), self.users[0].username)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pick(self.users[0], self.races[0], self.drivers[0])
+        self.assertContains(self.client.get(url), self.users[0].username)
+
+    def test_writes_only_drop_the_pages_they_change(self):
+        _, old_races = self.create_season(2000, 1, first_date=datetime.date(2000, 3, 1))
+        urls = [reverse('race_id', kwargs={'id': old_races[0].id}), reverse('standing_year', kwargs={'year': 2000})]
+        for url in urls:
+            self.client.get(url)
+        self.assertNotContains(self.client.get(reverse('race')), 'user42')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            submissions.submit_pick(self.races[-1], user_id=42, username='user42', name='User 42', profile_img='')
+        with self.assertNumQueries(len(urls)):
+            for url in urls:
+                self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertContains(self.client.get(reverse('race')), 'user42')
+
+    def test_versions_are_shared_and_bumped_in_one_statement(self):
+        url = reverse('race')
+        self.client.get(url)
+        with self.captureOnCommitCallbacks(execute=True):
+            submissions.submit_pick(self.races[-1], user_id=43, username='user43', name='', profile_img='')
+        self.assertContains(self.client.get(url), 'user43')
+        # Once its keys have been purged before, a purge is a single UPDATE
+        keys = [edge.race_key(self.races[-1].id), edge.user_key(43), edge.LISTINGS]
+        with CaptureQueriesContext(connection) as queries:
+            PageVersion.objects.bump(keys)
+        self.assertEqual(len(queries), 1)
+
+        # A purge made by another process, without this one's cache knowing
+        RacePick.objects.filter(user_id=43).update(tweet_id='2')
+        PageVersion.objects.bump([edge.race_key(self.races[-1].id)])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        self.assertGreater(len(queries), 1)
+
+
+class RequestMetricsTests(FantasyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        metrics.registry.windows.clear()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        middleware = ['fantasy_racing.picks.metrics.RequestMetricsMiddleware'] + settings.MIDDLEWARE
+        overrides = override_settings(
+            MIDDLEWARE=middleware, REQUEST_METRICS_DIR=directory.name, REQUEST_METRICS_FLUSH_INTERVAL=0,
+            PAGE_CACHE_TIMEOUT=0,
+        )
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def test_request_metrics_logged_and_dumped(self):
+        url = reverse('standings')
+        with self.assertLogs('fantasy_racing.metrics') as logs:
+            response = self.client.get(url)
+            self.client.get(url)
+
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+        self.assertIn('view=standings method=GET status=200', logs.output[0])
+        record = logs.records[0].metrics
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertLessEqual(record['template_ms'], record['total_ms'])
+
+        out = io.StringIO()
+        call_command('dump_metrics', as_json=True, stdout=out)
+        summary = json.loads(out.getvalue())
+        self.assertEqual(summary['standings']['total_ms']['count'], 2)
+        self.assertEqual(summary['standings']['queries']['max'], record['queries'])
+
+    async def test_async_requests_are_measured(self):
+        with self.assertLogs('fantasy_racing.metrics') as logs:
+            response = await self.async_client.get(reverse('standings'))
+
+        self.assertEqual(response.status_code, 200)
+        record = logs.records[0].metrics
+        self.assertGreater(record['queries'], 0)
+        self.assertGreater(record['template_ms'], 0)
+
+    def test_files_of_exited_workers_are_pruned(self):
+        stale = os.path.join(settings.REQUEST_METRICS_DIR, '1-0.json')
+        with open(stale, 'w') as f:
+            json.dump({}, f)
+        expired = time.time() - settings.REQUEST_METRICS_RETENTION - 1
+        os.utime(stale, (expired, expired))
+
+        with self.assertLogs('fantasy_racing.metrics'):
+            self.client.get(reverse('standings'))
+        self.assertFalse(os.path.exists(stale))
+        self.assertEqual(len(os.listdir(settings.REQUEST_METRICS_DIR)), 1)
+
+
+class StatsSnapshotTests(FantasyTestCase):
+
+    def test_snapshot_matches_live_queries(self):
+        user1, user2, _ = self.users
+        self.pick(user1, self.races[0], self.drivers[0])
+        self.pick(user2, self.races[0], self.drivers[1])
+        self.pick(user2, self.races[1], self.drivers[1])
+        self.result(self.races[0], self.drivers[0], position=1, points=25)
+        self.result(self.races[0], self.drivers[1], position=4, points=12)
+
+        data = StatsSnapshot.objects.compute()
+        self.assertEqual(dict(data['single_stats']), {
+            'Total Players': 2, 'Total Picks': 3, 'Most Common Pick': self.drivers[1].last_name,
+            'Winning Picks': 1, 'Total Races': Race.objects.viewable().count(), 'Average Finish': 2.5,
+        })
+        self.assertEqual(data['starts'][0], {'username': user2.username, 'starts': 2})
+        self.assertEqual(data['most_wins'][0], {'username': user1.username, 'num_wins': 1})
+
+    def test_current_refreshes_stale_snapshots(self):
+        first = StatsSnapshot.objects.current()
+        self.assertEqual(StatsSnapshot.objects.current(), first)
+        StatsSnapshot.objects.filter(id=first.id).update(created=timezone.now() - datetime.timedelta(days=1))
+        self.assertNotEqual(StatsSnapshot.objects.current(), first)
+
+
+class SeasonStandingTests(FantasyTestCase):
+
+    def assertStandingsMatchLive(self):
+        call_command('rebuild_standings', check_only=True, stdout=io.StringIO())
+
+    def test_picks_and_results_update_standings(self):
+        user1, user2, _ = self.users
+        self.pick(user1, self.races[0], self.drivers[0])
+        self.pick(user2, self.races[0], self.drivers[1])
+        self.pick(user1, self.races[1], self.drivers[1])
+
+        standing = SeasonStanding.objects.get(user=user1, schedule=self.schedule)
+        self.assertEqual(standing.starts, 2)
+        self.assertEqual(standing.points, 0)
+
+        self.result(self.races[0], self.drivers[0], position=1, points=25)
+        self.result(self.races[0], self.drivers[1], position=2, points=18)
+        self.result(self.races[1], self.drivers[1], position=11, points=0)
+
+        standing.refresh_from_db()
+        self.assertEqual(
+            (standing.points, standing.starts, standing.wins, standing.podiums, standing.top_10s),
+            (25, 2, 1, 1, 1)
+        )
+        self.assertEqual(standing.avg_finish, 6.0)
+        self.assertStandingsMatchLive()
+
+    def test_result_edit_and_pick_delete(self):
+        user1, _, _ = self.users
+        pick = self.pick(user1, self.races[0], self.drivers[0])
+        result = self.result(self.races[0], self.drivers[0], position=3, points=15)
+        result.position, result.points = 1, 25
+        result.save()
+        self.assertEqual(SeasonStanding.objects.get(user=user1).points, 25)
+        self.assertStandingsMatchLive()
+
+        pick.delete()
+        self.assertFalse(SeasonStanding.objects.filter(user=user1).exists())
+        self.assertStandingsMatchLive()
+
+
+class ProgressionTests(FantasyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        user1, user2, user3 = self.users
+        d1, d2, d3, _ = self.drivers
+        for user, race, driver in [
+            (user1, 0, d1), (user2, 0, d2), (user1, 1, d1), (user2, 1, d2), (user3, 1, d3), (user1, 2, d1),
+        ]:
+            self.pick(user, self.races[race], driver)
+        self.result(self.races[0], d1, position=1, points=10)
+        self.result(self.races[0], d2, position=2, points=5)
+        self.result(self.races[1], d2, position=1, points=10)
+        self.result(self.races[1], d3, position=2, points=10)
+        self.result(self.races[1], d1, position=3, points=0)
+
+    def test_points_and_rank_after_every_race(self):
+        self.schedule.refresh_from_db()
+        season = progression.for_schedule(self.schedule)
+        user1, user2, user3 = self.users
+        race0, race1, _ = self.races
+
+        # The race without results yet is left out
+        self.assertEqual([race.id for race in season.races], [race0.id, race1.id])
+        self.assertEqual(season.series(user1.id), {race0.id: (10, 1), race1.id: (10, 2)})
+        self.assertEqual(season.series(user2.id), {race0.id: (5, 2), race1.id: (15, 1)})
+        # Tied on points with user1, ranked after them by user ID, and only from their first race
+        self.assertEqual(season.series(user3.id), {race1.id: (10, 3)})
+        self.assertEqual(season.series(404), {})
+
+        self.assertEqual(season.movement(user1.id), -1)
+        self.assertEqual(season.movement(user2.id), 1)
+        self.assertIsNone(season.movement(user3.id))
+
+        # Ranked like the standings table
+        final = {user.id: season.series(user.id)[race1.id].rank for user in self.users}
+        standings = SeasonStanding.objects.filter(schedule=self.schedule).order_by('-points', 'user_id')
+        self.assertEqual([standing.user_id for standing in standings], sorted(final, key=final.get))
+
+    def test_kept_until_the_standings_change(self):
+        self.schedule.refresh_from_db()
+        season = progression.for_schedule(self.schedule)
+        with self.assertNumQueries(0):
+            self.assertIs(progression.for_schedule(self.schedule), season)
+
+        # The version is kept in the database, so a rebuild in any process is seen by every other one
+        self.result(self.races[2], self.drivers[0], position=1, points=25)
+        self.assertIs(progression.for_schedule(self.schedule), season)
+        self.schedule.refresh_from_db()
+        season = progression.for_schedule(self.schedule)
+        self.assertEqual(len(season.races), 3)
+        self.assertEqual(season.series(self.users[0].id)[self.races[2].id], (35, 1))
+
+    def test_shown_on_standings_and_player_pages(self):
+        response = self.client.get(reverse('standing_year', kwargs={'year': self.schedule.year}))
+        self.assertContains(response, 'After 2 Races')
+        movement = {standing.user_id: standing.movement for standing in response.context['standings']}
+        self.assertEqual(movement, {1: -1, 2: 1, 3: None})
+
+        response = self.client.get(
+            reverse('player_season', kwargs={'username': self.users[0].username, 'year': self.schedule.year})
+        )
+        self.assertEqual(
+            [pick.standing_after for pick in response.context['picks']], [(10, 1), (10, 2), None]
+        )
+
+
+class RankIndexTests(FantasyTestCase):
+
+    def setUp(self):
+        super().setUp()
+        # Twitter IDs run to 64 bits
+        self.users.append(TwitterUser.objects.create(id=2 ** 63 - 1, username='late', name='Late', profile_img=''))
+        for user, driver, position, points in zip(self.users, self.drivers, [2, 1, 3, 4], [10, 25, 10, 10]):
+            self.pick(user, self.races[0], driver)
+            self.result(self.races[0], driver, position=position, points=points)
+        # Picked without a result yet, still in the table on no points
+        self.pick(self.users[0], self.races[1], self.drivers[0])
+
+    def test_positions_match_the_standings_table(self):
+        self.schedule.refresh_from_db()
+        index = ranks.for_schedule(self.schedule)
+        table = SeasonStanding.objects.filter(schedule=self.schedule, starts__gt=0).order_by('-points', 'user_id')
+        self.assertEqual(len(index), 4)
+        self.assertEqual(
+            [index.position(standing.points, standing.user_id) for standing in table], [1, 2, 3, 4]
+        )
+        # Ties go to the lower user ID
+        self.assertEqual([standing.user_id for standing in table][1:], [1, 3, 2 ** 63 - 1])
+        self.assertIsNone(index.position(10, 404))
+        self.assertIsNone(index.position(99, 1))
+
+    def test_kept_until_the_standings_change(self):
+        self.schedule.refresh_from_db()
+        index = ranks.for_schedule(self.schedule)
+        with self.assertNumQueries(0):
+            self.assertIs(ranks.for_schedule(self.schedule), index)
+
+        self.result(self.races[1], self.drivers[0], position=1, points=25)
+        self.schedule.refresh_from_db()
+        index = ranks.for_schedule(self.schedule)
+        self.assertEqual(index.position(35, self.users[0].id), 1)
+
+    def test_new_entrants_are_ranked_straight_away(self):
+        self.schedule.refresh_from_db()
+        ranks.for_schedule(self.schedule)
+        season = progression.for_schedule(self.schedule)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            submissions.submit_pick(self.races[-1], user_id=42, username='user42', name='User 42', profile_img='')
+        # The schedule's row is left alone until the submission commits
+        self.assertEqual(Schedule.objects.get(id=self.schedule.id).standings_version, self.schedule.standings_version)
+        for callback in callbacks:
+            callback()
+        self.schedule.refresh_from_db()
+        index = ranks.for_schedule(self.schedule)
+        self.assertEqual((index.position(0, 42), len(index)), (5, 5))
+        # Their pick has no result yet, so the season's progression is kept
+        self.assertIs(progression.for_schedule(self.schedule), season)
+
+    def test_shown_on_player_pages(self):
+        response = self.client.get(
+            reverse('player_season', kwargs={'username': self.users[2].username, 'year': self.schedule.year})
+        )
+        self.assertContains(response, 'P3 <span class="f5 f4-l">of 4</span>', html=False)
+
+        response = self.client.get(reverse('player', kwargs={'username': self.users[1].username}))
+        self.assertContains(response, 'P1 of 4')
+
+
+class IngestResultsTests(FantasyTestCase):
+
+    def test_ingest_links_picks_and_rebuilds_standings(self):
+        user1, user2, _ = self.users
+        self.pick(user1, self.races[0], self.drivers[0])
+        self.pick(user2, self.races[0], self.drivers[1])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.csv') as f:
+            f.write('driver,position,points\n1,1,25\nDriver 2,2,18\n3,3,15\n')
+            f.flush()
+            call_command('ingest_results', f.name, race=self.races[0].date, stdout=io.StringIO())
+
+        self.assertEqual(RaceResult.objects.filter(race=self.races[0]).count(), 3)
+        self.assertEqual(RacePick.objects.get(user=user2).result.position, 2)
+        self.assertEqual(
+            list(SeasonStanding.objects.filter(schedule=self.schedule).values_list('user_id', 'points')),
+            [(user1.id, 25), (user2.id, 18)]
+        )
+
+    def test_invalid_records_are_reported(self):
+        cases = [
+            ('csv', 'driver,position\n1,1\n', 'Record 1: position and points'),
+            ('csv', 'driver,position,points\n1,1,25\n2,one,18\n', 'Record 2: position and points'),
+            ('csv', 'driver,position,points\n1,1,25\n1,2,18\n', 'Record 2: Track 0 in'),
+            ('csv', 'driver,position,points\n1,1,25\n2,1,18\n', 'that position'),
+            ('yaml', '', 'does not contain a list of records'),
+            ('json', '{"driver": 1}', 'does not contain a list of records'),
+            ('json', '[{"driver": 1, ', 'Unable to parse'),
+        ]
+        for format, content, message in cases:
+            with self.subTest(content), tempfile.NamedTemporaryFile('w', suffix=f'.{format}') as f:
+                f.write(content)
+                f.flush()
+                with self.assertRaisesMessage(CommandError, message):
+                    call_command('ingest_results', f.name, race=self.races[0].date, stdout=io.StringIO())
+        self.assertFalse(RaceResult.objects.exists())
+
+
+class SyntheticDataTests(FantasyTestCase):
+
+    def test_generate_data_builds_consistent_standings(self):
+        call_command('generate_data', users=20, seasons=2, races=4, stdout=io.StringIO())
+
+        self.assertEqual(TwitterUser.objects.count(), 23)
+        self.assertEqual(RacePick.objects.count(), 20 * 2 * 4)
+        self.assertFalse(RacePick.objects.filter(race__results__isnull=False, result__isnull=True).exists())
+        call_command('rebuild_standings', check_only=True, stdout=io.StringIO())
+
+        # Placed before the existing season, each within its own year
+        generated = Race.objects.exclude(schedule=self.schedule).select_related('schedule')
+        self.assertEqual({race.schedule.year for race in generated}, {self.schedule.year - 2, self.schedule.year - 1})
+        self.assertTrue(all(race.date.year == race.schedule.year for race in generated))
+        self.assertTrue(RaceResult.objects.filter(race__in=generated).exists())
+
+    def test_benchmark_indexes_refuses_databases_with_players(self):
+        with self.assertRaisesMessage(CommandError, '--i-know-this-is-not-production'):
+            call_command('benchmark_indexes', users=5, seasons=1, races=2, stdout=io.StringIO())
+
+    def test_benchmark_views_reports_every_url(self):
+        call_command('generate_data', users=5, seasons=1, races=3, stdout=io.StringIO())
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as f:
+            call_command('benchmark_views', repeat=2, output=f.name, stderr=io.StringIO())
+            report = json.load(f)
+
+        self.assertEqual(set(report['views']), {pattern.name for pattern in urls.urlpatterns})
+        self.assertTrue(report['views']['pick']['skipped'])
+        for view in ('standings', 'race_id', 'player_season'):
+            self.assertEqual(report['views'][view]['status'], 200)
+            self.assertGreater(report['views'][view]['queries'], 0)
+            self.assertLessEqual(report['views'][view]['p50_ms'], report['views'][view]['p95_ms'])
+
+
+class SyncFixturesTests(TestCase):
+    fixtures_dir = settings.BASE_DIR / 'fixtures'
+
+    def sync(self, *paths):
+        call_command('sync_fixtures', *(paths or sorted(self.fixtures_dir.glob('*.yaml'))), stdout=io.StringIO())
+
+    def test_matches_loaddata(self):
+        call_command('loaddata', *sorted(self.fixtures_dir.glob('*.yaml')), verbosity=0)
+        loaded = {
+            model: set(model.objects.values_list(*[f.attname for f in model._meta.concrete_fields]))
+            for model in (Schedule, Race, RaceTeam, RaceDriver)
+        }
+        with CaptureQueriesContext(connection) as queries:
+            self.sync()
+
+        # Nothing to write: one read per model inside the transaction
+        self.assertFalse([q for q in queries if not q['sql'].startswith(('SELECT', 'SAVEPOINT', 'RELEASE'))])
+        for model, rows in loaded.items():
+            self.assertEqual(set(model.objects.values_list(*[f.attname for f in model._meta.concrete_fields])), rows)
+
+    def test_updates_only_changed_rows(self):
+        self.sync()
+        self.assertEqual(RaceDriver.objects.get(last_name='Hamilton').default_team.name, 'Mercedes')
+        self.assertIn(44, [driver.default_number for driver in RaceDriver.objects.active_roster()])
+
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as f:
+            f.write(
+                '- model: picks.racedriver\n  fields:\n    first_name: Lewis\n    last_name: Hamilton\n'
+                '    default_number: 45\n    default_team: [Ferrari]\n'
+            )
+            f.flush()
+            out = io.StringIO()
+            call_command('sync_fixtures', f.name, stdout=out)
+
+        self.assertIn('picks.RaceDriver: 1 objects, 0 created, 1 updated', out.getvalue())
+        hamilton = RaceDriver.objects.get(last_name='Hamilton')
+        self.assertEqual((hamilton.default_number, hamilton.default_team.name), (45, 'Ferrari'))
+        # The bulk update skips the save signal, the command clears the cached roster itself
+        self.assertIn(45, [driver.default_number for driver in RaceDriver.objects.active_roster()])
+
+
+class RaceDriverRosterTests(FantasyTestCase):
+
+    def test_random_uses_cached_roster(self):
+        RaceDriver.objects.active_roster()
+        with self.assertNumQueries(0):
+            self.assertIn(RaceDriver.objects.random(), self.drivers)
+            self.assertEqual(len(RaceDriver.objects.random_many(50)), 50)
+
+    def test_roster_cleared_on_driver_save(self):
+        self.assertEqual(len(RaceDriver.objects.active_roster()), self.num_drivers)
+        self.drivers[0].is_active = False
+        self.drivers[0].save()
+        self.assertNotIn(self.drivers[0], RaceDriver.objects.active_roster())
+
+
+class PickEngineTests(FantasyTestCase):
+
+    def test_draws_are_reproducible(self):
+        race = self.races[0]
+        user_ids = [user.id for user in self.users]
+        drawn = engine.draw_many(race.id, user_ids)
+        self.assertEqual(drawn, engine.draw_many(race.id, user_ids))
+        for user_id, seed, driver in drawn:
+            self.assertEqual(seed, engine.pick_seed(race.id, user_id))
+            self.assertEqual(engine.draw(seed), driver)
+
+    def test_verify_race_flags_tampered_picks(self):
+        race = self.races[0]
+        picks = [
+            RacePick.objects.create(user_id=user_id, race=race, driver=driver, seed=seed, tweet_id='1')
+            for user_id, seed, driver in engine.draw_many(race.id, [user.id for user in self.users])
+        ]
+        self.assertEqual(engine.verify_race(race), [])
+
+        tampered = picks[0]
+        tampered.driver = next(driver for driver in self.drivers if driver != tampered.driver)
+        tampered.save()
+        self.assertEqual(engine.verify_race(race), [tampered])
+
+    def test_picks_verify_against_the_roster_at_draw_time(self):
+        race = self.races[-1]
+        for user in self.users:
+            submissions.submit_pick(race, user_id=user.id, username=user.username, name=user.name, profile_img='')
+        race.refresh_from_db()
+        self.assertEqual(race.roster, [driver.id for driver in self.drivers])
+
+        # A driver joining and another leaving the grid change later draws, not the stored ones
+        self.drivers[0].is_active = False
+        self.drivers[0].save()
+        RaceDriver.objects.create(
+            first_name='New', last_name='Driver', default_number=99, default_team=self.drivers[1].default_team
+        )
+        self.assertEqual(RaceDriver.objects.race_roster(race), self.drivers)
+        self.assertEqual(engine.verify_race(race), [])
+
+    def test_deleted_drivers_drop_out_of_stored_rosters(self):
+        race = self.races[-1]
+        Race.objects.filter(id=race.id).update(roster=[self.drivers[0].id, 404, self.drivers[1].id])
+        race.refresh_from_db()
+        self.assertEqual(RaceDriver.objects.race_roster(race), self.drivers[:2])
+        self.assertEqual(engine.stored_roster(race), self.drivers[:2])
+
+        # With nobody left, the race is drawn from the active roster again
+        RaceDriver.objects.clear_roster()
+        Race.objects.filter(id=race.id).update(roster=[404])
+        self.assertEqual(RaceDriver.objects.race_roster(race), self.drivers)
+        race.refresh_from_db()
+        self.assertEqual(race.roster, [driver.id for driver in self.drivers])
+
+
+class SchedulePageTests(FantasyTestCase):
+
+    def test_query_count_does_not_grow_with_season_length(self):
+        long_schedule, _ = self.create_season(2000, 22, first_date=datetime.date(2000, 3, 1))
+        for schedule in (self.schedule, long_schedule):
+            with self.assertNumQueries(4):
+                response = self.client.get(reverse('schedule_year', kwargs={'year': schedule.year}))
+            self.assertEqual(response.status_code, 200)
+
+    def test_race_listing_state(self):
+        self.pick(self.users[0], self.races[0], self.drivers[0])
+        future = Race.objects.create(
+            schedule=self.schedule, track='Future', date=self.races[-1].date + datetime.timedelta(weeks=1),
+            submit_by=timezone.now(),
+        )
+        listing = self.schedule.race_listing()
+        self.assertEqual([race.idx for race in listing], list(range(len(self.races) + 1)))
+        self.assertEqual([race.num_picks for race in listing], [1] + [0] * len(self.races))
+        for race in listing:
+            self.assertEqual(race.is_current, Race.objects.get(id=race.id).is_current)
+            self.assertEqual(race.is_viewable, Race.objects.get(id=race.id).is_viewable)
+        self.assertTrue(listing[-2].is_current)
+        self.assertEqual(listing[-1], future)
+        self.assertFalse(listing[-1].is_viewable)
+
+
+class PicksPageTests(FantasyTestCase):
+
+    def test_race_idx(self):
+        expected = list(range(len(self.races)))
+        # The picks page reads it from the listing its race is loaded with
+        race, listing = Race.objects.with_schedule(id=self.races[1].id)
+        with self.assertNumQueries(0):
+            self.assertEqual(([race.idx for race in listing], race.idx), (expected, 1))
+        self.assertEqual([Race.objects.get(id=race.id).idx for race in self.races], expected)
+
+    def test_race_and_navigation_loaded_together(self):
+        race, listing = Race.objects.with_schedule(id=self.races[1].id)
+        self.assertEqual(race, self.races[1])
+        self.assertEqual(listing, self.races)
+        current, _ = Race.objects.with_schedule()
+        self.assertEqual(current, self.races[-1])
+        self.assertEqual(Race.objects.with_schedule(id=0), (None, []))
+
+    def test_current_race_page(self):
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('race'))
+        self.assertContains(response, self.races[-1].track)
+
+
+class PickSubmissionTests(FantasyTestCase):
+
+    def submit(self, user_id: int):
+        return submissions.submit_pick(
+            self.races[-1], user_id=user_id, username=f'user{user_id}', name=f'User {user_id}',
+            profile_img='https://a.b/c.png',
+        )
+
+    def test_submit_creates_user_pick_and_standing(self):
+        pick, created = self.submit(42)
+
+        self.assertTrue(created)
+        self.assertEqual(pick.user.username, 'user42')
+        self.assertEqual(pick.driver, engine.draw(pick.seed))
+        self.assertEqual(SeasonStanding.objects.get(user_id=42, schedule=self.schedule).starts, 1)
+
+    def test_resubmit_returns_existing_pick(self):
+        first, _ = self.submit(1)
+        with self.assertNumQueries(5):  # savepoint, two ignored inserts, the read back and release
+            pick, created = self.submit(1)
+
+        self.assertFalse(created)
+        self.assertEqual(pick, first)
+        self.assertEqual(SeasonStanding.objects.get(user_id=1, schedule=self.schedule).starts, 1)
+
+    def test_recycled_username_is_taken_from_the_stale_player(self):
+        stale = TwitterUser.objects.create(id=7, username='user42', name='Old', profile_img='https://a.b/c.png')
+        with self.captureOnCommitCallbacks(execute=True):
+            pick, created = self.submit(42)
+
+        self.assertTrue(created)
+        self.assertEqual(pick.user.username, 'user42')
+        stale.refresh_from_db()
+        self.assertEqual(stale.username, '~7')
+        self.assertIsNotNone(stale.profile_refresh_requested)
+
+
+class CurrentRaceTests(FantasyTestCase):
+
+    def test_current_race_cached_until_a_race_is_saved(self):
+        race = self.races[-1]
+        self.assertEqual(Race.objects.current(), race)
+        with self.assertNumQueries(0):
+            Race.objects.current()
+            self.assertTrue(race.is_current)
+            self.assertTrue(self.races[0].is_viewable)
+
+        race.date -= datetime.timedelta(days=1)
+        race.save()
+        self.assertIsNone(Race.objects.current())
+
+    def test_current_race_expires_at_the_submission_deadline(self):
+        race = self.races[-1]
+        race.submit_by = timezone.now() + datetime.timedelta(minutes=5)
+        race.save()
+        self.assertTrue(Race.objects.current().submissions_open)
+
+        with mock.patch('django.utils.timezone.now', return_value=race.submit_by), self.assertNumQueries(1):
+            self.assertFalse(Race.objects.current().submissions_open)
+
+    def test_closed_race_redirects_play(self):
+        response = self.client.get(reverse('play'))
+        self.assertRedirects(response, reverse('race_id', kwargs={'id': self.races[-1].id}))
+        self.assertContains(self.client.get(reverse('index')), 'are closed')
+
+
+class FakeTwitterMixin:
+    """Runs `fake_twitter` on a local port for the whole class, with the settings pointing at it
+    """
+
+    fake_twitter: FakeTwitter
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = FakeTwitterServer(cls.fake_twitter)
+        cls.server.start()
+        cls.addClassCleanup(cls.server.stop)
+        overrides = override_settings(
+            TWITTER_API_URL=cls.server.url, TWITTER_KEY='key', TWITTER_SECRET='secret', TWITTER_BEARER_TOKEN='bearer',
+        )
+        overrides.enable()
+        cls.addClassCleanup(overrides.disable)
+
+
+class TwitterFlowTests(FakeTwitterMixin, FantasyTestCase):
+
+    fake_twitter = FakeTwitter()
+
+    def setUp(self):
+        super().setUp()
+        self.races[-1].submit_by = timezone.now() + datetime.timedelta(hours=1)
+        self.races[-1].save()
+
+    def sign_in(self) -> str:
+        """Go through /play and the fake sign in page, returning the /pick callback URL
+        """
+        authenticate = self.client.get(reverse('play'))['Location']
+        self.assertTrue(authenticate.startswith(f'{self.server.url}/oauth/authenticate?'))
+        callback = requests.get(authenticate, allow_redirects=False).headers['Location']
+        return f'{reverse("pick")}?{urlsplit(callback).query}'
+
+    def test_sign_in_and_pick(self):
+        callback = self.sign_in()
+        with self.assertLogs('fantasy_racing.picks') as logs:
+            response = self.client.get(callback)
+
+        self.assertContains(response, 'made a pick for')
+        self.assertIn('@fakeracer just joined for the first time!', logs.output[0])
+        pick = RacePick.objects.get(race=self.races[-1])
+        self.assertEqual((pick.user.id, pick.user.username), (1001, 'fakeracer'))
+        self.assertTrue(pick.user.profile_is_fresh)
+        # The request token is gone, so a refresh starts over
+        self.assertRedirects(self.client.get(callback), reverse('index'), fetch_redirect_response=False)
+
+    def test_known_players_skip_get_me(self):
+        fetches = self.fake_twitter.calls.get('/2/users/me', 0)
+        fresh = TwitterUser.objects.create(
+            id=1001, username='fakeracer', name='Stored Name', profile_img='https://a.b/c.png',
+            profile_updated=timezone.now(),
+        )
+        self.assertContains(self.client.get(self.sign_in()), 'made a pick for')
+
+        self.assertEqual(self.fake_twitter.calls.get('/2/users/me', 0), fetches)
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.name, 'Stored Name')
+        self.assertIsNone(fresh.profile_refresh_requested)
+
+    def test_stale_profiles_queued_for_refresh(self):
+        fetches = self.fake_twitter.calls.get('/2/users/me', 0)
+        stale = TwitterUser.objects.create(
+            id=1001, username='fakeracer', name='Stored Name', profile_img='https://a.b/c.png',
+            profile_updated=timezone.now() - datetime.timedelta(seconds=settings.TWITTER_PROFILE_TTL + 1),
+        )
+        self.assertContains(self.client.get(self.sign_in()), 'made a pick for')
+
+        self.assertEqual(self.fake_twitter.calls.get('/2/users/me', 0), fetches)
+        stale.refresh_from_db()
+        self.assertIsNotNone(stale.profile_refresh_requested)
+
+    def test_reused_verifier_redirects_to_race(self):
+        callback = self.sign_in()
+        with self.assertLogs('fantasy_racing.picks'):
+            self.client.get(callback)
+        self.client.get(reverse('play'))
+
+        response = self.client.get(callback)
+        self.assertRedirects(response, reverse('race_id', kwargs={'id': self.races[-1].id}))
+
+    def test_slow_twitter_times_out(self):
+        self.fake_twitter.delay = 0.5
+        self.addCleanup(setattr, self.fake_twitter, 'delay', 0)
+        with override_settings(TWITTER_TIMEOUT=0.1), self.assertLogs('django.request', 'ERROR'), \
+                self.assertRaises(twitter.TwitterError) as error:
+            self.client.get(reverse('play'))
+        self.assertIsNone(error.exception.status)
+
+    async def test_pooled_clients_share_a_session(self):
+        async with twitter.get_client() as first:
+            token = await first.get_request_token()
+        async with twitter.get_client() as second:
+            await second.get_request_token()
+
+        self.assertIs(first.session, second.session)
+        self.assertTrue(token['oauth_token'].startswith('request-'))
+        await first.session.close()
+
+
+class RefreshProfilesTests(FakeTwitterMixin, FantasyTestCase):
+
+    fake_twitter = FakeTwitter(users=[
+        {'id': '1', 'username': 'renamed1', 'name': 'New Name', 'profile_image_url': 'https://a.b/new.png'},
+        {'id': '2', 'username': 'user2', 'name': 'User 2', 'profile_image_url': 'https://a.b/c.png'},
+    ])
+
+    def refresh(self, **options) -> list:
+        """Run the command, returning how long it was told to sleep for
+        """
+        sleeps = []
+        with mock.patch.object(refresh_profiles.Command, 'sleep', sleeps.append):
+            call_command('refresh_profiles', stdout=io.StringIO(), **options)
+        return sleeps
+
+    def test_refresh_through_twitter_lookup(self):
+        lookups = self.fake_twitter.calls.get('/2/users', 0)
+        self.refresh(all_users=True, batch_size=2)
+
+        self.assertEqual(self.fake_twitter.calls['/2/users'] - lookups, 2)
+        self.assertFalse(TwitterUser.objects.filter(profile_refresh_requested__isnull=False).exists())
+        renamed, unchanged, missing = TwitterUser.objects.order_by('id')
+        self.assertEqual((renamed.username, renamed.name), ('renamed1', 'New Name'))
+        self.assertTrue(renamed.profile_is_fresh and unchanged.profile_is_fresh)
+        # Users Twitter no longer knows keep their profile
+        self.assertEqual((missing.username, missing.profile_updated), ('user3', None))
+
+    def test_rate_limits_are_waited_out(self):
+        self.fake_twitter.rate_limit = self.fake_twitter.remaining = 2
+        self.addCleanup(setattr, self.fake_twitter, 'rate_limit', None)
+        lookups = self.fake_twitter.calls.get('/2/users', 0)
+        self.refresh(all_users=True, batch_size=1)
+
+        # The window runs out after two lookups and the third is turned away once, then retried
+        self.assertEqual(self.fake_twitter.calls['/2/users'] - lookups, 4)
+        self.assertEqual(TwitterUser.objects.get(id=1).username, 'renamed1')
+        self.assertFalse(TwitterUser.objects.filter(profile_refresh_requested__isnull=False).exists())
+
+    def test_failed_lookups_are_retried_with_backoff(self):
+        lookup = profiles.TwitterProfileBackend.lookup
+        failures = [twitter.TwitterError(503, 'Over capacity'), asyncio.TimeoutError()]
+
+        def flaky_lookup(backend, user_ids):
+            if failures:
+                raise failures.pop(0)
+            return lookup(backend, user_ids)
+
+        with mock.patch.object(profiles.TwitterProfileBackend, 'lookup', flaky_lookup):
+            sleeps = self.refresh(all_users=True, stderr=io.StringIO())
+
+        self.assertEqual(sleeps, [refresh_profiles.RETRY_DELAY, refresh_profiles.RETRY_DELAY * 2])
+        self.assertEqual(TwitterUser.objects.get(id=1).username, 'renamed1')
+        self.assertFalse(TwitterUser.objects.filter(profile_refresh_requested__isnull=False).exists())
+
+    def test_rate_limits_without_a_future_reset_still_back_off(self):
+        lookup = profiles.TwitterProfileBackend.lookup
+        limits = [twitter.RateLimited('Too Many Requests', reset=0), twitter.RateLimited('Too Many Requests', reset=0)]
+
+        def limited_lookup(backend, user_ids):
+            if limits:
+                raise limits.pop(0)
+            return lookup(backend, user_ids)
+
+        with mock.patch.object(profiles.TwitterProfileBackend, 'lookup', limited_lookup):
+            sleeps = self.refresh(all_users=True)
+
+        self.assertEqual([round(sleep) for sleep in sleeps], [refresh_profiles.RETRY_DELAY, refresh_profiles.RETRY_DELAY * 2])
+        self.assertFalse(TwitterUser.objects.filter(profile_refresh_requested__isnull=False).exists())
+
+    def test_lookups_that_keep_failing_leave_the_queue(self):
+        stderr = io.StringIO()
+        error = aiohttp.ClientConnectionError('Connection refused')
+        with mock.patch.object(profiles.TwitterProfileBackend, 'lookup', side_effect=error):
+            sleeps = self.refresh(all_users=True, stderr=stderr)
+
+        self.assertEqual(len(sleeps), refresh_profiles.RETRIES)
+        self.assertIn('leaving 3 users queued', stderr.getvalue())
+        self.assertEqual(TwitterUser.objects.filter(profile_refresh_requested__isnull=False).count(), 3)
+
+    @override_settings(PROFILE_REFRESH_BACKEND='fantasy_racing.picks.profiles.StubProfileBackend')
+    def test_stale_profiles_through_stub_backend(self):
+        TwitterUser.objects.filter(id=2).update(profile_updated=timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            self.refresh(stale=True)
+
+        self.assertEqual(sum('UPDATE' in query['sql'] for query in queries), 2)  # queue, then one bulk_update
+        self.assertEqual(list(TwitterUser.objects.order_by('id').values_list('username', flat=True)),
+                         ['user1', 'user2', 'user3'])
+        self.assertFalse(TwitterUser.objects.filter(profile_updated__isnull=True).exists())
+
+
+class ConcurrentPickSubmissionTests(TransactionTestCase):
+
+    def test_parallel_duplicate_submissions(self):
+        team = RaceTeam.objects.create(name='Williams')
+        RaceDriver.objects.bulk_create([
+            RaceDriver(first_name='Driver', last_name=f'{idx}', default_number=idx, default_team=team)
+            for idx in range(4)
+        ])
+        schedule = Schedule.objects.create(year=timezone.now().year)
+        race = Race.objects.create(schedule=schedule, track='Track', date=timezone.now().date(), submit_by=timezone.now())
+        RaceDriver.objects.clear_roster()
+
+        def submit(user_id: int):
+            try:
+                return submissions.submit_pick(
+                    race, user_id=user_id, username=f'user{user_id}', name='User', profile_img='https://a.b/c.png',
+                )[1]
+            finally:
+                connections.close_all()
+
+        # 300 submissions from 30 players, ten each, all at once
+        with self.assertLogs('fantasy_racing.picks.submissions') as logs, ThreadPoolExecutor(max_workers=16) as executor:
+            created = list(executor.map(submit, [user_id for user_id in range(1, 31) for _ in range(10)]))
+
+        self.assertEqual(sum(created), 30)
+        self.assertEqual(len(logs.output), 30)
+        self.assertEqual(RacePick.objects.filter(race=race).count(), 30)
+        self.assertEqual(TwitterUser.objects.count(), 30)
+        self.assertEqual(set(SeasonStanding.objects.values_list('starts', flat=True)), {1})
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import views
+from . import api, views
 
 
 urlpatterns = [
@@ -22,5 +22,11 @@ urlpatterns = [
 
     path('stats', views.statistics, name='statistics'),
 
+    path('api/v1/schedule/<int:year>', api.schedule, name='api_schedule'),
+    path('api/v1/picks/<int:id>', api.race_picks, name='api_race_picks'),
+    path('api/v1/standings/<int:year>', api.standings, name='api_standings'),
+    path('api/v1/players', api.players, name='api_players'),
+    path('api/v1/players/<str:username>', api.player, name='api_player'),
+
     path('', views.index, name='index'),
 ]
\ No newline at end of file
@@ -1,23 +1,38 @@
 from collections import namedtuple
 import logging
 import random
+from urllib.parse import urlencode
 
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
 from django.http import Http404, HttpRequest
 from django.shortcuts import get_object_or_404, redirect, render, HttpResponseRedirect
-import tweepy
 
 from fantasy_racing.utils import twitter
 
-from .models import FAQ, Race, RaceDriver, RacePick, Schedule, TwitterUser
+from . import edge, progression, ranks, submissions
+from .cache import cached_page
+from .models import CareerStanding, FAQ, Race, RacePick, Schedule, SeasonStanding, StatsSnapshot, TwitterUser
+from .pagination import paginate
 
 
 logger = logging.getLogger(__name__)
 
+# Orderings the players listing can be sorted by, each backed by an index on `CareerStanding`
+PLAYER_ORDERINGS = {
+    'starts': ('-starts', 'avg_finish', 'user_id'),
+    'points': ('-points', 'user_id'),
+    'avg_finish': ('avg_finish', 'user_id'),
+}
+
+
+def next_page_url(request: HttpRequest, cursor: str) -> str:
+    return f'{request.path}?{urlencode({**request.GET.dict(), "after": cursor})}' if cursor else None
+
 
 def index(request):
     race = Race.objects.current()
-    return render(request, 'index.html', {
+    return edge.cache_at_edge(render(request, 'index.html', {
         'race': race,
         'headline': random.choice([
             'The fantasy racing game where you don\'t get to pick who wins.',
@@ -26,161 +41,185 @@ def index(request):
             'Fantasy racing that\'s not considered gambling.',
             'Fantasy racing crossed with a random number generator.',
         ])
-    })
+    }))
 
 
 def about(request):
-    return render(request, 'about.html', {
+    return edge.cache_at_edge(render(request, 'about.html', {
         'faqs': FAQ.objects.all(),
         'title': 'About'
-    })
+    }))
 
 
+@cached_page
 def schedule(request, year=None):
     schedule = Schedule.objects.last() if year is None else get_object_or_404(Schedule, year=year)
     years = Schedule.objects.values_list('year', flat=True)
-    return render(request, 'schedule.html', {
-        'schedule': schedule, 'years': years, 'title': f'{schedule.year} Schedule'
+    races = schedule.race_listing()
+    response = render(request, 'schedule.html', {
+        'schedule': schedule, 'races': races, 'years': years,
+        'title': f'{schedule.year} Schedule'
     })
+    # The listing already knows whether any race is still to come
+    finished = not any(race.is_current for race in races)
+    return edge.cache_at_edge(response, [edge.schedule_key(schedule.year)], final=finished)
 
 
+@cached_page
 def picks(request, id=None):
-    race = Race.objects.current() if id is None else get_object_or_404(Race, id=id)
+    race, schedule_races = Race.objects.with_schedule(id=id)
     if not race:
         raise Http404
     
-    picks = RacePick.objects.filter(race=race).all()
-    return render(request, 'picks.html', {'race': race, 'title': f'{race} Picks', 'picks': picks})
+    picks = RacePick.objects.filter(race=race).for_display()
+    response = render(request, 'picks.html', {
+        'race': race, 'schedule_races': schedule_races, 'title': f'{race} Picks', 'picks': picks
+    })
+    # Picks and results of races already run only change when a write purges them, but the schedule's
+    # navigation moves on with the current race, without a write, until the whole season has been run
+    keys = [edge.race_key(race.id), edge.schedule_key(race.date.year)]
+    return edge.cache_at_edge(response, keys, final=not any(race.is_current for race in schedule_races))
 
 
+@cached_page
 def standings(request, year=None):
     schedule = Schedule.objects.last() if year is None else get_object_or_404(Schedule, year=year)
-    standings = TwitterUser.objects \
-                           .participating_users(schedule=schedule) \
-                           .details(schedule=schedule) \
-                           .order_by('-points')
+    standings = SeasonStanding.objects.filter(schedule=schedule, starts__gt=0)
     leader = standings.first()
     leader_points = -1 * (leader.points if leader else 0)
-    return render(request, 'standings.html', {
-        'schedule': schedule, 'title': f'{schedule.year} Standings',
-        'standings': standings, 'leader_points': leader_points
+
+    query = request.GET.get('q', '').strip()
+    if query:
+        standings = standings.filter(user__in=TwitterUser.objects.search(query))
+    page = paginate(standings.select_related('user'), ('-points', 'user_id'), request.GET.get('after'))
+    season_progression = progression.for_schedule(schedule)
+    for standing in page.rows:
+        standing.movement = season_progression.movement(standing.user_id)
+    response = render(request, 'standings.html', {
+        'schedule': schedule, 'title': f'{schedule.year} Standings', 'query': query, 'standings': page.rows,
+        'races_resulted': len(season_progression.races),
+        'leader': leader, 'leader_points': leader_points, 'next_url': next_page_url(request, page.next_cursor),
     })
+    return edge.cache_at_edge(response, [edge.schedule_key(schedule.year)], final=schedule.is_finished)
+
+
+def rank_seasons(seasons):
+    """Set each season's championship position and how many players it was out of
+    """
+    for season in seasons:
+        index = ranks.for_schedule(season.schedule)
+        season.position, season.field_size = index.position(season.points, season.user_id), len(index)
 
 
 def player(request, username):
-    twitter_user = TwitterUser.objects.filter(username=username).details().first()
-    if not twitter_user:
-        raise Http404
-    user_seasons = list(filter(lambda season: season.starts > 0, [
-        TwitterUser.objects.filter(username=username).annotate(year=models.Value(sched.year)).details(schedule=sched).first()
-        for sched in Schedule.objects.all().order_by('-year')
-    ]))
-    return render(request, 'player.html', {
-        'user': twitter_user, 'title': f'{twitter_user} Career', 'seasons': user_seasons
+    twitter_user = get_object_or_404(TwitterUser, username=username)
+    career, user_seasons = SeasonStanding.objects.breakdown(twitter_user)
+    rank_seasons(user_seasons)
+    response = render(request, 'player.html', {
+        'user': twitter_user, 'stats': career, 'title': f'{twitter_user} Career', 'seasons': user_seasons
     })
+    return edge.cache_at_edge(response, [edge.user_key(twitter_user.id)])
 
 
 def player_season(request, username: str, year: int):
     schedule = get_object_or_404(Schedule, year=year)
-    twitter_user = TwitterUser.objects.filter(username=username).details(schedule=schedule).first()
-    user_seasons = list(filter(lambda season: season.starts > 0, [
-        TwitterUser.objects.filter(username=username).with_start_count(schedule=schedule).annotate(year=models.Value(sched.year)).first()
-        for sched in Schedule.objects.all().order_by('-year')
-    ]))
-    picks = RacePick.objects.filter(user=twitter_user, race__schedule=schedule).all()
-    return render(request, 'player.html', {
-        'user': twitter_user, 'seasons': user_seasons, 'year': year,
-        'picks': picks, 'title': f'{twitter_user} {year} Schedule',
+    twitter_user = get_object_or_404(TwitterUser, username=username)
+    _, user_seasons = SeasonStanding.objects.breakdown(twitter_user)
+    season = next((season for season in user_seasons if season.schedule.id == schedule.id), None)
+    rank_seasons([season] if season else [])
+    picks = RacePick.objects.filter(user=twitter_user, race__schedule=schedule).for_display()
+    series = progression.for_schedule(schedule).series(twitter_user.id)
+    for pick in picks:
+        pick.standing_after = series.get(pick.race_id)
+    response = render(request, 'player.html', {
+        'user': twitter_user, 'stats': season or SeasonStanding(user=twitter_user, schedule=schedule),
+        'seasons': user_seasons, 'year': year, 'picks': picks, 'title': f'{twitter_user} {year} Schedule',
     })
+    keys = [edge.user_key(twitter_user.id), edge.schedule_key(schedule.year)]
+    return edge.cache_at_edge(response, keys, final=schedule.is_finished)
 
 
+@cached_page
 def players(request):
-    users = TwitterUser.objects \
-                       .details() \
-                       .order_by('-starts', 'avg_finish')
-    return render(request, 'players.html', {'users': users, 'title': 'Players'})
-
-
+    sort = request.GET.get('sort', 'starts')
+    if sort not in PLAYER_ORDERINGS:
+        sort = 'starts'
+    careers = CareerStanding.objects.filter(starts__gt=0)
+    if sort == 'avg_finish':
+        # Players without results have no average finish to rank
+        careers = careers.filter(finish_count__gt=0)
+
+    query = request.GET.get('q', '').strip()
+    if query:
+        careers = careers.filter(user__in=TwitterUser.objects.search(query))
+    page = paginate(careers.select_related('user'), PLAYER_ORDERINGS[sort], request.GET.get('after'))
+    return edge.cache_at_edge(render(request, 'players.html', {
+        'careers': page.rows, 'sort': sort, 'query': query, 'next_url': next_page_url(request, page.next_cursor),
+        'title': 'Players',
+    }), [edge.LISTINGS])
+
+
+@cached_page
 def statistics(request):
     SingleStat = namedtuple('SingleStat', field_names=('title', 'value'))
-    common_picks = RaceDriver.objects.annotate(num_picks=models.Count('picks')).order_by('-num_picks')[:25]
-    most_wins = TwitterUser.objects \
-                           .annotate(num_wins=models.Count('picks', filter=models.Q(picks__result__position=1))) \
-                           .order_by('-num_wins')
-
-    return render(request, 'statistics.html', {
-        'single_stats': [
-            SingleStat(title='Total Players', value=TwitterUser.objects.count()),
-            SingleStat(title='Total Picks', value=RacePick.objects.count()),
-            SingleStat(title='Most Common Pick', value=common_picks.first().last_name),
-            SingleStat(title='Winning Picks', value=RacePick.objects.filter(result__position=1).count()),
-            SingleStat(title='Total Races', value=Race.objects.viewable().count()),
-            SingleStat(
-                title='Average Finish',
-                value=RacePick.objects.filter(result__isnull=False) \
-                                      .aggregate(res=models.Avg('result__position'))['res'] or 0
-            ),
-        ],
-        'starts': TwitterUser.objects.with_start_count().order_by('-starts')[:25],
-        'common_picks': common_picks,
-        'most_wins': most_wins,
+    snapshot = StatsSnapshot.objects.current()
+    return edge.cache_at_edge(render(request, 'statistics.html', {
+        'single_stats': [SingleStat(title, value) for title, value in snapshot.data['single_stats']],
+        'starts': snapshot.data['starts'],
+        'common_picks': snapshot.data['common_picks'],
+        'most_wins': snapshot.data['most_wins'],
+        'snapshot': snapshot,
         'title': 'Statistics'
-    })
+    }), [edge.LISTINGS])
 
 
-def play(request: HttpRequest):
-    oauth = twitter.get_oauth_client()
-    auth_url = oauth.get_authorization_url(signin_with_twitter=True)
-    response = HttpResponseRedirect(auth_url)
-    request.session['request_token'] = oauth.request_token
-    return response
+async def play(request: HttpRequest):
+    race = await sync_to_async(Race.objects.current)()
+    if not race:
+        raise Http404
+    if not race.submissions_open:
+        return redirect('race_id', id=race.id)
+
+    async with twitter.get_client(pooled=isinstance(request, ASGIRequest)) as client:
+        request_token = await client.get_request_token()
+    await sync_to_async(request.session.__setitem__)('request_token', request_token)
+    return HttpResponseRedirect(twitter.authorization_url(request_token))
 
 
-def pick(request: HttpRequest):
-    race = Race.objects.current()
+async def pick(request: HttpRequest):
+    race = await sync_to_async(Race.objects.current)()
     if not race:
         raise Http404
+    if not race.submissions_open:
+        return redirect('race_id', id=race.id)
 
     verifier = request.GET.get('oauth_verifier')
-    oauth = twitter.get_oauth_client()
-    token = request.session.get('request_token')
+    # remove the request token now we don't need it
+    token = await sync_to_async(request.session.pop)('request_token', None)
     if not (token and verifier):
         return redirect('index')
 
-	# remove the request token now we don't need it
-    request.session.delete('request_token')
-    oauth.request_token = token
-
-    try:
-        access_token, access_token_secret = oauth.get_access_token(verifier)
-    except tweepy.TweepyException as e:
-        # If people refresh the page, then we just send them to the race page
-        if '401' in str(e):
-            return redirect('race_id', id=race.id)
-        else:
+    async with twitter.get_client(pooled=isinstance(request, ASGIRequest)) as client:
+        try:
+            access_token = await client.get_access_token(token, verifier)
+        except twitter.TwitterError as e:
+            # If people refresh the page, then we just send them to the race page
+            if e.status == 401:
+                return redirect('race_id', id=race.id)
             raise e
 
-    client = twitter.get_client(access_token, access_token_secret)
-    try:
-        user_response = client.get_me(user_fields=['profile_image_url', 'username', 'id', 'name'])
-        user = user_response.data
-    except tweepy.Forbidden as e:
-        logger.exception('unable to get user info: %s', e.response.json())
-        raise e
-    
-    twitter_user, created = TwitterUser.objects.get_or_create(id=user.id, defaults=dict(
-        username=user.username, name=user.name, profile_img=user.profile_image_url,
-    ))
+        try:
+            user = await submissions.get_profile(client, access_token)
+        except twitter.TwitterError as e:
+            logger.exception('unable to get user info: %s', e.body)
+            raise e
+
+    pick, created = await sync_to_async(submissions.submit_pick)(
+        race, user_id=user.id, username=user.username, name=user.name, profile_img=user.profile_image_url,
+    )
+    twitter_user = pick.user
     if created:
-        logger.info('%s just joined for the first time!', twitter_user)
-
-    random_driver: RaceDriver = RaceDriver.objects.random()
-    pick, created = RacePick.objects.get_or_create(user=twitter_user, race=race, defaults=dict(
-        driver=random_driver,
-        tweet_id=1490491780520943620
-    ))
-    if not created:
         logger.info('Created %s', pick)
 
     context = {'race': race, 'user': twitter_user, 'pick': pick, 'created': created, 'title': 'Pick'}
-    return render(request, 'pick.html', context)
\ No newline at end of file
+    return await sync_to_async(render)(request, 'pick.html', context)
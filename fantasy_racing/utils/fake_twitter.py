@@ -0,0 +1,166 @@
+"""A stand-in for the parts of the Twitter API the app uses
+
+Used by the tests, and handy locally: run it, point `TWITTER_API_URL` at it and `/play` signs you in as
+one of its users without going anywhere near Twitter.
+
+    python -m fantasy_racing.utils.fake_twitter --port 8001
+    TWITTER_API_URL=http://127.0.0.1:8001 ./manage.py runserver
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Dict, List
+from urllib.parse import urlencode
+
+from aiohttp import web
+from oauthlib.oauth1.rfc5849.utils import parse_authorization_header
+
+
+DEFAULT_USERS = [
+    {'id': '1001', 'username': 'fakeracer', 'name': 'Fake Racer', 'profile_image_url': 'https://example.com/fake.png'},
+]
+
+
+class FakeTwitter:
+    """The OAuth 1.0a endpoints, `GET /2/users/me` and the `GET /2/users` lookup, answering with a fixed set
+    of users
+    """
+
+    def __init__(self, users: List[dict] = None, delay: float = 0, rate_limit: int = None):
+        self.users = {user['id']: user for user in users or DEFAULT_USERS}
+        # Seconds every response is held back, to exercise client timeouts
+        self.delay = delay
+        # User lookups allowed per rate limit window, None for no limit
+        self.rate_limit = rate_limit
+        self.remaining = rate_limit
+        self.calls: Dict[str, int] = {}
+        self.callbacks: Dict[str, str] = {}
+        self.verifiers: Dict[str, tuple] = {}
+        self.counter = itertools.count(1)
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self.track])
+        app.add_routes([
+            web.post('/oauth/request_token', self.request_token),
+            web.get('/oauth/authenticate', self.authenticate),
+            web.post('/oauth/access_token', self.access_token),
+            web.get('/2/users/me', self.me),
+            web.get('/2/users', self.lookup),
+        ])
+        return app
+
+    @web.middleware
+    async def track(self, request: web.Request, handler):
+        self.calls[request.path] = self.calls.get(request.path, 0) + 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        return await handler(request)
+
+    @staticmethod
+    def oauth_params(request: web.Request) -> dict:
+        return dict(parse_authorization_header(request.headers.get('Authorization', '')))
+
+    async def request_token(self, request: web.Request) -> web.Response:
+        token = f'request-{next(self.counter)}'
+        self.callbacks[token] = self.oauth_params(request)['oauth_callback']
+        return web.Response(text=urlencode({
+            'oauth_token': token, 'oauth_token_secret': f'{token}-secret', 'oauth_callback_confirmed': 'true',
+        }))
+
+    async def authenticate(self, request: web.Request) -> web.Response:
+        """Sign in straight away, as `?user_id=` or the first user, and head back to the callback
+        """
+        token = request.query['oauth_token']
+        user_id = request.query.get('user_id', next(iter(self.users)))
+        verifier = f'verifier-{next(self.counter)}'
+        self.verifiers[verifier] = (token, user_id)
+        callback = self.callbacks.pop(token)
+        raise web.HTTPFound(f'{callback}?{urlencode({"oauth_token": token, "oauth_verifier": verifier})}')
+
+    async def access_token(self, request: web.Request) -> web.Response:
+        params = self.oauth_params(request)
+        token, user_id = self.verifiers.pop(params.get('oauth_verifier'), (None, None))
+        if token is None or token != params.get('oauth_token'):
+            # Verifiers only work once, like Twitter's
+            return web.Response(status=401, text='Invalid request token.')
+        user = self.users[user_id]
+        return web.Response(text=urlencode({
+            'oauth_token': f'access-{user_id}', 'oauth_token_secret': f'access-{user_id}-secret',
+            'user_id': user_id, 'screen_name': user['username'],
+        }))
+
+    async def me(self, request: web.Request) -> web.Response:
+        token = self.oauth_params(request).get('oauth_token', '')
+        user = self.users.get(token.replace('access-', '', 1))
+        if user is None:
+            return web.json_response({'title': 'Unauthorized', 'status': 401}, status=401)
+        return web.json_response({'data': user})
+
+    async def lookup(self, request: web.Request) -> web.Response:
+        if not request.headers.get('Authorization', '').startswith('Bearer '):
+            return web.json_response({'title': 'Unauthorized', 'status': 401}, status=401)
+
+        headers = {}
+        if self.rate_limit is not None:
+            # Windows end as soon as a client is turned away, so nobody really has to wait for the reset
+            if self.remaining <= 0:
+                self.remaining = self.rate_limit
+                headers = {'x-rate-limit-remaining': '0', 'x-rate-limit-reset': str(time.time())}
+                return web.json_response({'title': 'Too Many Requests', 'status': 429}, status=429, headers=headers)
+            self.remaining -= 1
+            headers = {'x-rate-limit-remaining': str(self.remaining), 'x-rate-limit-reset': str(time.time())}
+
+        ids = request.query['ids'].split(',')
+        found = [self.users[user_id] for user_id in ids if user_id in self.users]
+        missing = [{'value': user_id, 'title': 'Not Found Error'} for user_id in ids if user_id not in self.users]
+        return web.json_response({'data': found, **({'errors': missing} if missing else {})}, headers=headers)
+
+
+class FakeTwitterServer:
+    """Serve a `FakeTwitter` from a background thread on a free local port
+    """
+
+    def __init__(self, twitter: FakeTwitter = None, host: str = '127.0.0.1', port: int = 0):
+        self.twitter = twitter or FakeTwitter()
+        self.host = host
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        self.thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self.loop).result()
+
+    async def _start(self):
+        self.runner = web.AppRunner(self.twitter.app())
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, self.host, self.port)
+        await site.start()
+        self.port = self.runner.addresses[0][1]
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.runner.cleanup(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8001)
+    parser.add_argument('--users', help='JSON file with a list of users, each with id, username, name and profile_image_url')
+    args = parser.parse_args()
+
+    users = None
+    if args.users:
+        with open(args.users) as f:
+            users = json.load(f)
+    web.run_app(FakeTwitter(users=users).app(), host=args.host, port=args.port)
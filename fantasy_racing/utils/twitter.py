@@ -1,17 +1,162 @@
+"""Async Twitter API client for the sign in and pick flow
+
+Requests are signed with OAuth 1.0a (oauthlib) and sent with aiohttp, so the `play` and `pick` views wait
+on Twitter without holding a worker. Under ASGI every request shares one pooled session per event loop.
+Under WSGI each request gets its own event loop, and with it a session that is closed afterwards.
+
+`TWITTER_API_URL` points the client somewhere other than Twitter, e.g. `fantasy_racing.utils.fake_twitter`.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import json
+import time
+from typing import AsyncIterator, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode
+import weakref
+
+import aiohttp
 from django.conf import settings
-import tweepy
+from oauthlib import oauth1
 
 
-def get_oauth_client():
-    callback = settings.TWITTER_CALLBACK
-    return tweepy.OAuth1UserHandler(
-        consumer_key=settings.TWITTER_KEY, consumer_secret=settings.TWITTER_SECRET,
-        callback=callback
-    )
+class TwitterError(Exception):
+    """A failed call, `status` is None when Twitter could not be reached in time
+    """
+
+    def __init__(self, status: Optional[int], body: str):
+        super().__init__(f'{status}: {body}')
+        self.status = status
+        self.body = body
+
+
+class RateLimited(TwitterError):
+    """Too many requests, `reset` is the epoch time the window reopens
+    """
+
+    def __init__(self, body: str, reset: float):
+        super().__init__(429, body)
+        self.reset = reset
 
 
-def get_client(access_token: str, access_token_secret: str) -> tweepy.Client:
-    return tweepy.Client(
-        consumer_key=settings.TWITTER_KEY, consumer_secret=settings.TWITTER_SECRET,
-        access_token=access_token, access_token_secret=access_token_secret
+@dataclass
+class Profile:
+    id: int
+    username: str
+    name: str
+    profile_image_url: str
+
+    @classmethod
+    def from_api(cls, user: dict) -> 'Profile':
+        return cls(
+            id=int(user['id']), username=user['username'], name=user['name'],
+            profile_image_url=user['profile_image_url'],
+        )
+
+
+# One pooled session per event loop, dropped along with its loop
+_sessions = weakref.WeakKeyDictionary()
+
+
+def new_session() -> aiohttp.ClientSession:
+    return aiohttp.ClientSession(
+        timeout=aiohttp.ClientTimeout(total=settings.TWITTER_TIMEOUT, connect=settings.TWITTER_CONNECT_TIMEOUT),
+        connector=aiohttp.TCPConnector(
+            limit=settings.TWITTER_MAX_CONNECTIONS, keepalive_timeout=settings.TWITTER_KEEPALIVE_TIMEOUT,
+            ttl_dns_cache=300,
+        ),
     )
+
+
+def pooled_session() -> aiohttp.ClientSession:
+    loop = asyncio.get_running_loop()
+    session = _sessions.get(loop)
+    if session is None or session.closed:
+        session = _sessions[loop] = new_session()
+    return session
+
+
+@asynccontextmanager
+async def get_client(pooled: bool = True) -> AsyncIterator['TwitterClient']:
+    """A client on this event loop's pooled session, or on a session of its own that is closed on exit
+    """
+    if pooled:
+        yield TwitterClient(pooled_session())
+        return
+    async with new_session() as session:
+        yield TwitterClient(session)
+
+
+def authorization_url(request_token: dict) -> str:
+    """Where to send the user to sign in, see https://developer.twitter.com/en/docs/authentication/oauth-1-0a
+    """
+    return f'{settings.TWITTER_API_URL}/oauth/authenticate?{urlencode({"oauth_token": request_token["oauth_token"]})}'
+
+
+class TwitterClient:
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+        # Requests left in the current rate limit window and when it resets, from the last response
+        self.rate_limit_remaining: Optional[int] = None
+        self.rate_limit_reset: Optional[float] = None
+
+    async def request(self, method: str, path: str, params: dict = None, token: str = None,
+                      token_secret: str = None, app_only: bool = False, **oauth_params) -> str:
+        """Call the API signed as the user owning `token`, or with the app's bearer token if `app_only`
+        """
+        url = f'{settings.TWITTER_API_URL}{path}'
+        if params:
+            url = f'{url}?{urlencode(params)}'
+        if app_only:
+            headers = {'Authorization': f'Bearer {settings.TWITTER_BEARER_TOKEN}'}
+        else:
+            signer = oauth1.Client(
+                settings.TWITTER_KEY, client_secret=settings.TWITTER_SECRET,
+                resource_owner_key=token, resource_owner_secret=token_secret, **oauth_params
+            )
+            url, headers, _ = signer.sign(url, http_method=method)
+
+        try:
+            async with self.session.request(method, url, headers=headers) as response:
+                body = await response.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise TwitterError(None, f'{method} {path} failed: {e!r}') from e
+
+        if 'x-rate-limit-remaining' in response.headers:
+            self.rate_limit_remaining = int(response.headers['x-rate-limit-remaining'])
+            self.rate_limit_reset = float(response.headers['x-rate-limit-reset'])
+        if response.status == 429:
+            raise RateLimited(body, reset=self.rate_limit_reset or time.time() + 60)
+        if response.status >= 400:
+            raise TwitterError(response.status, body)
+        return body
+
+    async def get_request_token(self) -> dict:
+        body = await self.request('POST', '/oauth/request_token', callback_uri=settings.TWITTER_CALLBACK)
+        token = dict(parse_qsl(body))
+        return {'oauth_token': token['oauth_token'], 'oauth_token_secret': token['oauth_token_secret']}
+
+    async def get_access_token(self, request_token: dict, verifier: str) -> dict:
+        """Trade a signed in user's request token for theirs, which also carries `user_id` and `screen_name`
+        """
+        body = await self.request(
+            'POST', '/oauth/access_token', token=request_token['oauth_token'],
+            token_secret=request_token['oauth_token_secret'], verifier=verifier,
+        )
+        return dict(parse_qsl(body))
+
+    async def get_me(self, access_token: str, access_token_secret: str) -> Profile:
+        body = await self.request(
+            'GET', '/2/users/me', params={'user.fields': 'profile_image_url'},
+            token=access_token, token_secret=access_token_secret,
+        )
+        return Profile.from_api(json.loads(body)['data'])
+
+    async def lookup_users(self, user_ids: Iterable[int]) -> List[Profile]:
+        """Profiles of up to 100 users in one call. Deleted and suspended users are left out.
+        """
+        body = await self.request('GET', '/2/users', app_only=True, params={
+            'ids': ','.join(str(user_id) for user_id in user_ids), 'user.fields': 'profile_image_url',
+        })
+        return [Profile.from_api(user) for user in json.loads(body).get('data', [])]
@@ -4,4 +4,4 @@ set -e
 ./manage.py collectstatic --no-input
 ./manage.py migrate
 
-./manage.py loaddata fantasy_racing/fixtures/*.yaml
\ No newline at end of file
+./manage.py sync_fixtures fantasy_racing/fixtures/*.yaml
\ No newline at end of file